@@ -0,0 +1,532 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import database
+
+# Backups completos y diferenciales de la base de datos.
+#
+# - Completo: copia en línea con la API de backup de SQLite
+#   (database.backup_to) + un índice con el hash de cada página (<base>.pages).
+# - Diferencial: se toma otra copia consistente, se compara página por página
+#   con el índice del último completo y solo se guardan las páginas distintas
+#   en un archivo .dbdiff. Para restaurar: base + un diferencial.
+#
+# El manifiesto SNAPSHOT_MANIFEST dice cuál es la base vigente. Índices y
+# manifiesto van en la subcarpeta SNAPSHOT_DIR, así la carpeta elegida por el
+# usuario solo tiene los backups (.db / .dbdiff).
+#
+# - Automático (BackupScheduler): copia en línea verificada con
+#   PRAGMA integrity_check, comprimida con gzip (.db.gz), y retención de
+#   los últimos / uno por hora / uno por día.
+
+SNAPSHOT_DIR = "backup_index"
+SNAPSHOT_MANIFEST = "snapshots.json"
+PAGE_INDEX_SUFFIX = ".pages"
+DIFF_SUFFIX = ".dbdiff"
+DIFF_MAGIC = b"WTSDIFF1"
+_DIFF_HEADER = struct.Struct("<8sII")    # magic, page_size, page_count
+_PAGE_NO = struct.Struct("<I")
+_HASH_SIZE = 16
+
+# si cambia más de esta fracción de las páginas, conviene un completo nuevo
+DIFF_REBASE_RATIO = 0.5
+
+
+# ------------------ PÁGINAS ------------------ #
+
+def page_size_of(path):
+    """Tamaño de página de un archivo SQLite (bytes 16-17 del encabezado)."""
+    with open(path, "rb") as f:
+        header = f.read(100)
+    if len(header) < 100 or not header.startswith(b"SQLite format 3\x00"):
+        raise ValueError(f"{path} no es una base de datos SQLite")
+    size = int.from_bytes(header[16:18], "big")
+    return 65536 if size == 1 else size
+
+
+def _iter_pages(path, page_size):
+    with open(path, "rb") as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                return
+            yield page
+
+
+def _page_hash(page):
+    return hashlib.blake2b(page, digest_size=_HASH_SIZE).digest()
+
+
+def _index_dir(folder):
+    return Path(folder) / SNAPSHOT_DIR
+
+
+def _page_index_path(db_path):
+    db_path = Path(db_path)
+    return _index_dir(db_path.parent) / (db_path.name + PAGE_INDEX_SUFFIX)
+
+
+def write_page_index(db_path):
+    """Guarda el hash de cada página de db_path en SNAPSHOT_DIR/<nombre>.pages."""
+    page_size = page_size_of(db_path)
+    index_path = _page_index_path(db_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(index_path, "wb") as f:
+        for page in _iter_pages(db_path, page_size):
+            f.write(_page_hash(page))
+    return str(index_path)
+
+
+def _read_page_index(index_path):
+    with open(index_path, "rb") as f:
+        data = f.read()
+    return [data[i:i + _HASH_SIZE] for i in range(0, len(data), _HASH_SIZE)]
+
+
+# ------------------ MANIFIESTO ------------------ #
+
+def _load_manifest(folder):
+    path = _index_dir(folder) / SNAPSHOT_MANIFEST
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print("Manifiesto de backups inválido, se hará un backup completo:", e)
+        return None
+
+
+def _save_manifest(folder, manifest):
+    path = _index_dir(folder) / SNAPSHOT_MANIFEST
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".part")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ------------------ BACKUPS ------------------ #
+
+def full_backup(dest_folder, progress=None):
+    """
+    Backup completo (database.backup_database) que además queda como base
+    de los diferenciales de esa carpeta (índice en SNAPSHOT_DIR).
+    Devuelve la ruta del .db.
+    """
+    path = database.backup_database(dest_folder, progress=progress)
+    write_page_index(path)
+    _save_manifest(dest_folder, {
+        "base": Path(path).name,
+        "page_size": page_size_of(path),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    })
+    return path
+
+
+def differential_backup(dest_folder, progress=None):
+    """
+    Backup diferencial: solo las páginas que cambiaron desde el último
+    backup completo de dest_folder. Si no hay base (o cambió el tamaño de
+    página, o cambió más de DIFF_REBASE_RATIO de las páginas) hace un
+    completo. Devuelve la ruta del archivo creado (.db o .dbdiff).
+    """
+    manifest = _load_manifest(dest_folder)
+    base_path = Path(dest_folder) / manifest["base"] if manifest else None
+    index_path = _page_index_path(base_path) if base_path else None
+    if base_path is None or not base_path.exists() or not index_path.exists():
+        return full_backup(dest_folder, progress=progress)
+
+    # copia consistente temporal, para comparar sin tocar la BD viva
+    fd, tmp_copy = tempfile.mkstemp(suffix=".db", dir=dest_folder)
+    os.close(fd)
+    try:
+        database.backup_to(tmp_copy, progress=progress)
+        page_size = page_size_of(tmp_copy)
+        if page_size != manifest["page_size"]:
+            return full_backup(dest_folder, progress=progress)
+
+        base_hashes = _read_page_index(index_path)
+        changed = []
+        page_count = 0
+        for page_no, page in enumerate(_iter_pages(tmp_copy, page_size)):
+            page_count += 1
+            if page_no >= len(base_hashes) or _page_hash(page) != base_hashes[page_no]:
+                changed.append(page_no)
+
+        if page_count and len(changed) > DIFF_REBASE_RATIO * page_count:
+            return full_backup(dest_folder, progress=progress)
+
+        timestamp = datetime.now().strftime("%Y-%m-%d_at_%H-%M-%S")
+        diff_path = Path(dest_folder) / f"{base_path.stem}_diff_{timestamp}{DIFF_SUFFIX}"
+        _write_diff(diff_path, tmp_copy, base_path.name, page_size, page_count, changed)
+        return str(diff_path)
+    finally:
+        try:
+            os.remove(tmp_copy)
+        except OSError:
+            pass
+
+
+def _write_diff(diff_path, db_path, base_name, page_size, page_count, changed):
+    """
+    Formato .dbdiff:
+      magic (8) | page_size (u32) | page_count (u32) | largo del nombre (u16) | nombre de la base
+      y por cada página cambiada: número de página (u32, desde 0) | página.
+    """
+    base_bytes = base_name.encode("utf-8")
+    tmp_path = Path(str(diff_path) + ".part")
+    with open(db_path, "rb") as src, open(tmp_path, "wb") as out:
+        out.write(_DIFF_HEADER.pack(DIFF_MAGIC, page_size, page_count))
+        out.write(struct.pack("<H", len(base_bytes)) + base_bytes)
+        for page_no in changed:
+            src.seek(page_no * page_size)
+            out.write(_PAGE_NO.pack(page_no))
+            out.write(src.read(page_size))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, diff_path)
+
+
+def _read_diff_header(f):
+    magic, page_size, page_count = _DIFF_HEADER.unpack(f.read(_DIFF_HEADER.size))
+    if magic != DIFF_MAGIC:
+        raise ValueError("El archivo no es un backup diferencial")
+    (name_len,) = struct.unpack("<H", f.read(2))
+    base_name = f.read(name_len).decode("utf-8")
+    return page_size, page_count, base_name
+
+
+def restore_backup(backup_path, target_path):
+    """
+    Reconstruye una base de datos en target_path a partir de un backup
+    completo (.db), automático (.db.gz) o diferencial (.dbdiff + su base en
+    la misma carpeta).
+    No toca la BD en uso: target_path debe ser otro archivo.
+    """
+    backup_path = Path(backup_path)
+    target_path = Path(target_path)
+    tmp_path = target_path.with_name(target_path.name + ".part")
+
+    if backup_path.suffix == ".gz":
+        with gzip.open(backup_path, "rb") as src, open(tmp_path, "wb") as out:
+            shutil.copyfileobj(src, out)
+        os.replace(tmp_path, target_path)
+        return str(target_path)
+
+    if backup_path.suffix != DIFF_SUFFIX:
+        shutil.copyfile(backup_path, tmp_path)
+        os.replace(tmp_path, target_path)
+        return str(target_path)
+
+    with open(backup_path, "rb") as diff:
+        page_size, page_count, base_name = _read_diff_header(diff)
+        base_path = backup_path.with_name(base_name)
+        if not base_path.exists():
+            raise FileNotFoundError(f"No se encontró el backup base {base_path}")
+
+        shutil.copyfile(base_path, tmp_path)
+        with open(tmp_path, "r+b") as out:
+            while True:
+                raw = diff.read(_PAGE_NO.size)
+                if not raw:
+                    break
+                (page_no,) = _PAGE_NO.unpack(raw)
+                page = diff.read(page_size)
+                if len(page) != page_size:
+                    raise ValueError("Backup diferencial incompleto")
+                out.seek(page_no * page_size)
+                out.write(page)
+            out.truncate(page_count * page_size)
+            out.flush()
+            os.fsync(out.fileno())
+
+    os.replace(tmp_path, target_path)
+    return str(target_path)
+
+
+# ------------------ VERIFICACIÓN ------------------ #
+
+class BackupVerifyError(Exception):
+    """La copia no pasó PRAGMA integrity_check."""
+    pass
+
+
+def verify_backup(db_path):
+    """Corre PRAGMA integrity_check sobre la copia; lanza BackupVerifyError si falla."""
+    conn = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+    try:
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        problems = [str(e)]
+    finally:
+        conn.close()
+    if problems != ["ok"]:
+        raise BackupVerifyError(
+            f"El backup {db_path} está dañado: " + "; ".join(problems[:5])
+        )
+
+
+# ------------------ BACKUPS AUTOMÁTICOS ------------------ #
+
+AUTO_BACKUP_TAG = "_auto_"
+AUTO_BACKUP_SUFFIX = ".db.gz"
+_AUTO_TIME_FORMAT = "%Y-%m-%d_at_%H-%M-%S"
+_AUTO_NAME_RE = re.compile(
+    re.escape(AUTO_BACKUP_TAG) + r"(\d{4}-\d{2}-\d{2}_at_\d{2}-\d{2}-\d{2})"
+    + re.escape(AUTO_BACKUP_SUFFIX) + "$"
+)
+
+
+def compressed_backup(dest_folder, compresslevel=6):
+    """
+    Copia en línea de la BD, verificada con integrity_check y comprimida:
+    <db>_auto_YYYY-MM-DD_at_HH-MM-SS.db.gz. Devuelve la ruta.
+    """
+    dest_folder = Path(dest_folder)
+    dest_folder.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime(_AUTO_TIME_FORMAT)
+    dest_path = dest_folder / f"{database.DB_PATH.stem}{AUTO_BACKUP_TAG}{timestamp}{AUTO_BACKUP_SUFFIX}"
+    gz_tmp = dest_path.with_name(dest_path.name + ".part")
+
+    fd, tmp_copy = tempfile.mkstemp(suffix=".db", dir=dest_folder)
+    os.close(fd)
+    try:
+        database.backup_to(tmp_copy)
+        verify_backup(tmp_copy)
+        with open(tmp_copy, "rb") as src, \
+                gzip.open(gz_tmp, "wb", compresslevel=compresslevel) as out:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        os.replace(gz_tmp, dest_path)
+    finally:
+        for path in (tmp_copy, gz_tmp):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return str(dest_path)
+
+
+def list_auto_backups(folder):
+    """Backups automáticos de `folder` como [(fecha, ruta)], del más nuevo al más viejo."""
+    found = []
+    for path in Path(folder).glob(f"*{AUTO_BACKUP_TAG}*{AUTO_BACKUP_SUFFIX}"):
+        match = _AUTO_NAME_RE.search(path.name)
+        if match:
+            found.append((datetime.strptime(match.group(1), _AUTO_TIME_FORMAT), path))
+    found.sort(reverse=True)
+    return found
+
+
+def apply_retention(folder, keep_last=5, keep_hourly=24, keep_daily=14):
+    """
+    Borra los backups automáticos que sobran. Se conservan:
+    - los `keep_last` más nuevos,
+    - el más nuevo de cada una de las últimas `keep_hourly` horas con backup,
+    - el más nuevo de cada uno de los últimos `keep_daily` días con backup.
+    Devuelve la lista de archivos borrados.
+    """
+    backups = list_auto_backups(folder)
+    keep = {path for _, path in backups[:keep_last]}
+
+    for limit, key_format in ((keep_hourly, "%Y-%m-%d %H"), (keep_daily, "%Y-%m-%d")):
+        seen = set()
+        for when, path in backups:
+            key = when.strftime(key_format)
+            if key in seen:
+                continue
+            if len(seen) >= limit:
+                break
+            seen.add(key)
+            keep.add(path)
+
+    removed = []
+    for _, path in backups:
+        if path in keep:
+            continue
+        try:
+            path.unlink()
+            removed.append(str(path))
+        except OSError as e:
+            print(f"No se pudo borrar el backup {path}:", e)
+    return removed
+
+
+class BackupScheduler:
+    """
+    Backups automáticos en un hilo propio (no bloquea la GUI).
+
+    - Cada `every_saves` registros guardados (notify_save()) o cada
+      `every_minutes` minutos, lo que ocurra primero; el backup por tiempo se
+      salta si la BD no cambió desde el último.
+    - Cada backup es compressed_backup (verificado y comprimido) seguido de
+      apply_retention.
+    - stop(final_backup=True) hace un último backup al cerrar la App.
+    Quedan last_backup (ruta) y error (excepción del último intento).
+    """
+
+    def __init__(self, dest_folder, every_saves=20, every_minutes=30.0,
+                 keep_last=5, keep_hourly=24, keep_daily=14):
+        self.dest_folder = Path(dest_folder)
+        self.every_saves = every_saves
+        self.every_minutes = every_minutes
+        self.retention = dict(keep_last=keep_last, keep_hourly=keep_hourly,
+                              keep_daily=keep_daily)
+
+        self.last_backup = None
+        self.error = None
+
+        self._saves = 0
+        self._last_at = time.monotonic()
+        self._last_signature = None
+        self._final_backup = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # lo que ya está en la BD al abrir la App no necesita otro backup
+        self._last_signature = self._db_signature()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def notify_save(self):
+        """Avisar cada vez que se guarda un registro."""
+        with self._lock:
+            self._saves += 1
+            due = self.every_saves and self._saves >= self.every_saves
+        if due:
+            self._wake.set()
+
+    def backup_now(self):
+        """Pide un backup en el hilo del scheduler (sin esperar)."""
+        with self._lock:
+            self._saves = max(self._saves, 1)
+            self._last_signature = None
+        self._last_at = 0.0
+        self._wake.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, final_backup=True, timeout=None):
+        """
+        Detiene el hilo; con final_backup, antes hace un último backup si hubo
+        cambios. timeout=0 solo lo pide y vuelve enseguida (la GUI revisa
+        `running` para saber cuándo terminó).
+        """
+        self._final_backup = final_backup
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None and timeout != 0:
+            self._thread.join(timeout=timeout)
+
+    def _db_signature(self):
+        """(mtime, tamaño) de la BD y su WAL: si no cambian, no hay nada nuevo que copiar."""
+        signature = []
+        for path in (database.DB_PATH, Path(str(database.DB_PATH) + "-wal")):
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _due(self):
+        with self._lock:
+            by_saves = self.every_saves and self._saves >= self.every_saves
+        by_time = (self.every_minutes
+                   and time.monotonic() - self._last_at >= self.every_minutes * 60)
+        return by_saves or by_time
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            timeout = None
+            if self.every_minutes:
+                timeout = max(0.0, self._last_at + self.every_minutes * 60 - time.monotonic())
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stop_event.is_set():
+                break
+            if self._due():
+                self._backup()
+
+        if self._final_backup:
+            self._backup()
+
+    def _backup(self):
+        signature = self._db_signature()
+        with self._lock:
+            saves, self._saves = self._saves, 0
+        self._last_at = time.monotonic()
+        if not saves and signature == self._last_signature:
+            return  # nada cambió desde el último backup
+
+        try:
+            path = compressed_backup(self.dest_folder)
+            apply_retention(self.dest_folder, **self.retention)
+        except Exception as e:
+            print("Error en el backup automático:", e)
+            self.error = e
+            return
+        self.last_backup = path
+        self.error = None
+        self._last_signature = signature
+
+
+class BackupJob(threading.Thread):
+    """
+    Backup completo (full_backup) en segundo plano, como exporter.ExportJob:
+    la GUI consulta done y al terminar quedan result (ruta) o error.
+    """
+
+    def __init__(self, dest_folder):
+        super().__init__(name="backup-job", daemon=True)
+        self.dest_folder = dest_folder
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def run(self):
+        try:
+            self.result = full_backup(self.dest_folder)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+
+# cuánto espera la App al último backup antes de cerrar igual
+EXIT_BACKUP_TIMEOUT_SEC = 30.0
+
+
+def scheduler_from_config(cfg):
+    """BackupScheduler con las claves backup_* de database.load_storage_config() (db_config.json)."""
+    folder = cfg.get("backup_folder") or database.DB_PATH.parent / "backups"
+    return BackupScheduler(
+        folder,
+        every_saves=int(cfg.get("backup_every_saves", 20)),
+        every_minutes=float(cfg.get("backup_every_min", 30.0)),
+        keep_last=int(cfg.get("backup_keep_last", 5)),
+        keep_hourly=int(cfg.get("backup_keep_hourly", 24)),
+        keep_daily=int(cfg.get("backup_keep_daily", 14)),
+    )
@@ -1,9 +1,17 @@
 import sqlite3
 from pathlib import Path
-import shutil
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import os
 import sys
+import json
+import time
+import threading
+import queue
+import math
+import bisect
+from contextlib import contextmanager
+
+import geo
 
 def _get_db_path() -> Path:
     # Si es ejecutable (PyInstaller)
@@ -19,6 +27,109 @@ def _get_db_path() -> Path:
     return data_dir / "database.db"
 
 DB_PATH = _get_db_path()
+
+# Cuántas sentencias preparadas guarda cada conexión (cache interno de sqlite3).
+# El valor por defecto de sqlite3 es 128; las consultas con listas de columnas
+# armadas (SQL_*, exportación, UPDATE por campo) son muchas variantes distintas.
+STATEMENT_CACHE_SIZE = 256
+
+# Máximo de conexiones ociosas que se guardan para hilos de trabajo
+POOL_SIZE = 4
+
+# Conexión persistente por hilo (la del hilo de la GUI vive toda la app)
+_thread_local = threading.local()
+# Conexiones prestadas a hilos de trabajo (ver pooled_connection)
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+# Registro de todas las conexiones abiertas, para cerrarlas al salir
+_open_connections = []
+_connections_lock = threading.Lock()
+
+# ------------------ AJUSTES DE ALMACENAMIENTO ------------------ #
+
+# Archivo opcional con ajustes de SQLite (junto a la base de datos)
+STORAGE_CONFIG_PATH = DB_PATH.parent / "db_config.json"
+
+# Configuración por defecto
+DEFAULT_STORAGE_CONFIG = {
+    "journal_mode": "WAL",            # WAL = lectores no se bloquean mientras se guarda
+    "synchronous": "NORMAL",          # en WAL, NORMAL no hace fsync en cada commit
+    "cache_size_kb": 16384,           # cache de páginas por conexión (16 MB)
+    "mmap_size_mb": 64,               # lecturas vía mmap (0 = desactivado)
+    "busy_timeout_ms": 5000,          # espera si otra conexión tiene el lock
+    "fallback_journal_mode": "DELETE",  # si WAL no se puede usar (medio de solo lectura, etc.)
+    "checkpoint_idle_sec": 30,        # segundos sin escrituras antes de hacer checkpoint
+    # PASSIVE no espera a los lectores ni bloquea a los que escriben; FULL /
+    # RESTART / TRUNCATE sí (hasta busy_timeout), así que solo al cerrar
+    "checkpoint_mode": "PASSIVE",     # checkpoint en ocio: PASSIVE / FULL / RESTART / TRUNCATE
+    "checkpoint_on_close": "TRUNCATE",  # al cerrar la App (None = no hacer)
+    # backups automáticos (ver backup.BackupScheduler)
+    "backup_enabled": True,
+    "backup_folder": None,            # None = carpeta "backups" junto a la BD
+    "backup_every_saves": 20,         # backup cada N registros guardados...
+    "backup_every_min": 30.0,         # ...o cada M minutos (si hubo cambios), y al cerrar
+    "backup_keep_last": 5,            # retención: los últimos K,
+    "backup_keep_hourly": 24,         # uno por hora de las últimas K horas,
+    "backup_keep_daily": 14,          # y uno por día de los últimos K días
+}
+
+# Estado real aplicado a la BD (lo que SQLite aceptó finalmente)
+storage_state = {
+    "journal_mode": None,
+    "read_only": False,
+}
+
+_checkpointer = None
+
+
+def load_storage_config():
+    """Carga db_config.json (si existe) encima de DEFAULT_STORAGE_CONFIG."""
+    cfg = DEFAULT_STORAGE_CONFIG.copy()
+    if STORAGE_CONFIG_PATH.exists():
+        try:
+            with open(STORAGE_CONFIG_PATH, "r", encoding="utf-8") as f:
+                cfg.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print("No se pudo leer db_config.json, usando valores por defecto:", e)
+    return cfg
+
+_storage_config = load_storage_config()
+
+
+def _is_writable_location():
+    """True si podemos escribir la BD (y sus archivos -wal/-shm) en su carpeta."""
+    folder = DB_PATH.parent
+    if not os.access(folder, os.W_OK):
+        return False
+    if DB_PATH.exists() and not os.access(DB_PATH, os.W_OK):
+        return False
+    return True
+
+
+def _apply_pragmas(conn, read_only):
+    cfg = _storage_config
+    conn.execute(f"PRAGMA busy_timeout = {int(cfg['busy_timeout_ms'])}")
+    # cache_size negativo = tamaño en KiB en lugar de número de páginas
+    conn.execute(f"PRAGMA cache_size = {-int(cfg['cache_size_kb'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(cfg['mmap_size_mb']) * 1024 * 1024}")
+
+    if read_only:
+        # en solo lectura no podemos cambiar el journal; nos quedamos con el actual
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    else:
+        wanted = str(cfg["journal_mode"]).upper()
+        try:
+            mode = conn.execute(f"PRAGMA journal_mode = {wanted}").fetchone()[0]
+        except sqlite3.OperationalError:
+            mode = None
+        if mode is None or mode.upper() != wanted:
+            fallback = str(cfg["fallback_journal_mode"]).upper()
+            mode = conn.execute(f"PRAGMA journal_mode = {fallback}").fetchone()[0]
+        conn.execute(f"PRAGMA synchronous = {str(cfg['synchronous']).upper()}")
+
+    storage_state["journal_mode"] = mode.lower()
+    storage_state["read_only"] = read_only
+
+
 # Mapeo GUI -> columna SQL
 GUI_TO_DB = {
     "Date": "created_at",
@@ -52,84 +163,324 @@ GUI_TO_DB = {
     "# Visibility": "visibility",
     "Hydrophone": "hydrophone",
     "Observations": "observations",
+    # columnas numéricas derivadas de Init Pos / Final Pos
+    "Init Latitude": "init_lat",
+    "Init Longitude": "init_lon",
+    "Final Latitude": "final_lat",
+    "Final Longitude": "final_lon",
 }
 
 DB_TO_GUI = {v: k for k, v in GUI_TO_DB.items()}
 
-def get_last_records(limit=6):
+# columna de texto -> (columna latitud, columna longitud)
+POSITION_COLUMNS = {
+    "init_pos": ("init_lat", "init_lon"),
+    "final_pos": ("final_lat", "final_lon"),
+}
+
+def parse_position(pos):
     """
-    Devuelve una lista de dicts con claves de la GUI (las de `columns`):
-    [{ "ID": "A", "Init Pos": "...", ... }, ...]
+    'lat, lon' -> (lat, lon) como float.
+    Devuelve (None, None) si el texto no es una posición (vacío, 'GPS_ERROR'...).
     """
-    with get_connection() as conn:
-        cur = conn.cursor()
-        # seleccionamos solo las columnas que conocemos
-        db_cols = list(DB_TO_GUI.keys())  # ej: ["id_tag", "init_pos", ...]
-        cols_sql = ", ".join(db_cols)
+    if not isinstance(pos, str) or "," not in pos:
+        return None, None
+    lat_str, lon_str = pos.split(",", 1)
+    try:
+        lat, lon = float(lat_str), float(lon_str)
+    except ValueError:
+        return None, None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None, None
+    return lat, lon
 
-        # ordenamos por created_at DESC para tener los más recientes primero
-        cur.execute(
-            f"""
-            SELECT id, {cols_sql}
-            FROM records
-            ORDER BY created_at DESC, id DESC
-            LIMIT ?
-            """,
-            (limit,)
-        )
-        rows = cur.fetchall()
+# Índices de la tabla records.
+# Nota: SQLite agrega el rowid (id) al final de cada índice, así que
+# (created_at, id) ya sirve también para filtros/orden solo por created_at.
+RECORD_INDEXES = {
+    "idx_records_created_at_id": "records(created_at, id)",
+    "idx_records_tag_created_at": "records(id_tag, created_at)",
+}
 
-    records = []
-    for row in rows:
-        db_id = row[0]          # ESTE es el id único de la BD (1,2,3,...)
-        data_cols = row[1:]
+def _day_range(start_date, end_date):
+    """
+    Convierte 'YYYY-MM-DD'..'YYYY-MM-DD' (ambos inclusive) en un rango
+    semiabierto [inicio, día siguiente al fin) comparable con created_at.
+    Así la columna no queda envuelta en date() y SQLite puede usar el índice.
+    """
+    start = date.fromisoformat(start_date)
+    end_exclusive = date.fromisoformat(end_date) + timedelta(days=1)
+    return start.isoformat(), end_exclusive.isoformat()
+
+# Columnas de las filas de registros (el id de la BD primero)
+RECORD_COLUMNS = ["id", *DB_TO_GUI.keys()]
+
+class Record(tuple):
+    """
+    Fila compacta de la tabla records: una tupla con los valores nativos de
+    SQLite (int/float/str/None) en el orden de RECORD_COLUMNS.
+    No tiene __dict__ ni claves por fila: el índice de columnas es compartido.
+
+    La GUI la usa igual que los dicts de antes (rec.get("Init Pos", "")):
+    el valor se convierte a texto solo cuando se pide.
+    """
+    __slots__ = ()
+
+    _index = {col: i for i, col in enumerate(RECORD_COLUMNS)}
+
+    @property
+    def db_id(self):
+        return self[0]
+
+    def value(self, db_col):
+        """Valor nativo de una columna SQL (p. ej. rec.value("init_lat"))."""
+        return self[self._index[db_col]]
+
+    def get(self, gui_key, default=""):
+        """Valor como texto para una columna de la GUI ('' si es NULL)."""
+        if gui_key == "_db_id":
+            return self[0]
+        db_col = GUI_TO_DB.get(gui_key)
+        if db_col is None:
+            return default
+        value = self[self._index[db_col]]
+        return "" if value is None else str(value)
+
+    def as_gui_dict(self):
+        """Dict completo con claves de la GUI (solo para depurar o casos puntuales)."""
+        gui_dict = {"_db_id": self[0]}
+        for gui_key in GUI_TO_DB:
+            gui_dict[gui_key] = self.get(gui_key)
+        return gui_dict
+
+# ------------------ CONSULTAS ------------------ #
+# El SQL de lectura vive en estas constantes y lo usan tanto las funciones
+# como check_query_plans(): si alguien cambia un WHERE/ORDER BY aquí, la
+# revisión de planes lo ve. {columns} y los fragmentos {where}/{keyset}/...
+# se completan solo con constantes del código, nunca con texto del usuario.
+
+_RECORD_COLUMNS_SQL = ", ".join(RECORD_COLUMNS)
+_WHERE_DAY_RANGE = "created_at >= ? AND created_at < ?"
+_WHERE_ID_TAG = "id_tag = ?"
+
+SQL_RECORDS_ORDERED = "SELECT {columns} FROM records {where} ORDER BY created_at ASC, id ASC"
+SQL_LAST_RECORDS = "SELECT {columns} FROM records ORDER BY created_at DESC, id DESC LIMIT ?"
+
+SQL_RECORDS_PAGE = (
+    "SELECT {columns} FROM records "
+    "WHERE created_at >= ? AND created_at < ? {keyset} "
+    "ORDER BY created_at {order}, id {order} LIMIT ?"
+)
+_KEYSET_AFTER = "AND (created_at, id) > (?, ?)"
+_KEYSET_BEFORE = "AND (created_at, id) < (?, ?)"
 
-        gui_dict = {"_db_id": db_id}
+SQL_COUNT_RECORDS = "SELECT count(*) FROM records {where}"
 
-        for db_col, value in zip(db_cols, data_cols):
-            gui_key = DB_TO_GUI.get(db_col)
-            if gui_key:
-                gui_dict[gui_key] = "" if value is None else str(value)
+# datos de cada avistamiento que usa fill_derived_columns
+SQL_DERIVED_INPUTS = SQL_RECORDS_ORDERED.format(
+    columns="id, created_at, init_time, final_time, init_lat, init_lon, final_lat, final_lon",
+    where=f"WHERE {_WHERE_DAY_RANGE}",
+)
 
-        records.append(gui_dict)
+_BBOX_INSIDE = """
+    ((r.init_lat BETWEEN :min_lat AND :max_lat AND r.init_lon BETWEEN :min_lon AND :max_lon)
+     OR (r.final_lat BETWEEN :min_lat AND :max_lat AND r.final_lon BETWEEN :min_lon AND :max_lon))
+"""
+_BBOX_WHERE_DATE = "AND r.created_at >= :start AND r.created_at < :end"
+SQL_RECORDS_IN_BBOX = f"""
+    SELECT r.id, {{columns}}
+    FROM records_rtree AS t
+    JOIN records AS r ON r.id = t.id
+    WHERE t.max_lat >= :min_lat AND t.min_lat <= :max_lat
+      AND t.max_lon >= :min_lon AND t.min_lon <= :max_lon
+      AND {_BBOX_INSIDE} {{where_date}}
+    ORDER BY r.created_at ASC, r.id ASC
+"""
+# SQLite compilado sin R*Tree: mismo resultado, pero recorriendo records
+SQL_RECORDS_IN_BBOX_SCAN = f"""
+    SELECT r.id, {{columns}}
+    FROM records AS r
+    WHERE {_BBOX_INSIDE} {{where_date}}
+    ORDER BY r.created_at ASC, r.id ASC
+"""
+
+SQL_ROUTE_TRACK = (
+    "SELECT recorded_at, lat, lon, accuracy FROM {table} "
+    "WHERE recorded_at >= ? AND recorded_at <= ? {where_route} "
+    "ORDER BY recorded_at ASC, id ASC"
+)
+_WHERE_ROUTE_ID = "AND route_id = ?"
+# puntos de la ruta con la hora en segundos (para cálculos en bloque)
+SQL_ROUTE_SECONDS = (
+    "SELECT CAST(strftime('%s', recorded_at) AS INTEGER), lat, lon FROM {table} "
+    "WHERE recorded_at >= ? AND recorded_at <= ? "
+    "ORDER BY recorded_at ASC, id ASC"
+)
+
+def _where(*conditions):
+    conditions = [c for c in conditions if c]
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+# Filas que se piden a SQLite por cada fetchmany()
+FETCH_BATCH_SIZE = 500
+
+def iter_records(start_date=None, end_date=None, id_tag=None, batch_size=None):
+    """
+    Generador de registros ordenados por fecha, sin cargar todo en memoria.
+    start_date, end_date: strings 'YYYY-MM-DD' opcionales (ambos inclusive).
+    id_tag: 'A', 'B' o 'C' para filtrar por ballena (opcional).
+
+    Entrega objetos Record (valores nativos de SQLite); se leen de a
+    `batch_size` filas con fetchmany().
+    """
+    batch_size = batch_size or FETCH_BATCH_SIZE
+
+    params = []
+    if start_date or end_date:
+        params.extend(_day_range(start_date or end_date, end_date or start_date))
+    if id_tag:
+        params.append(id_tag)
+    sql = SQL_RECORDS_ORDERED.format(
+        columns=_RECORD_COLUMNS_SQL,
+        where=_where(_WHERE_DAY_RANGE if (start_date or end_date) else "",
+                     _WHERE_ID_TAG if id_tag else ""),
+    )
+
+    cur = get_connection().cursor()
+    try:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from map(Record, rows)
+    finally:
+        cur.close()
+
+def iter_projection(columns, start_date=None, end_date=None, last=None, batch_size=None,
+                    conn=None):
+    """
+    Como iter_records, pero entrega tuplas con las expresiones SQL `columns`
+    (una proyección armada de antemano, p. ej. la del exportador) en lugar de
+    Record. Sin fechas y con `last`, entrega los últimos `last` registros
+    (más recientes primero), igual que get_last_records.
+    Las expresiones deben ser constantes del código, nunca texto del usuario.
+    conn: conexión a usar (p. ej. de pooled_connection); por defecto la del hilo.
+    """
+    batch_size = batch_size or FETCH_BATCH_SIZE
+    columns_sql = ", ".join(columns)
+
+    if start_date or end_date:
+        sql = SQL_RECORDS_ORDERED.format(columns=columns_sql, where=_where(_WHERE_DAY_RANGE))
+        params = _day_range(start_date or end_date, end_date or start_date)
+    elif last is not None:
+        sql = SQL_LAST_RECORDS.format(columns=columns_sql)
+        params = (int(last),)
+    else:
+        sql = SQL_RECORDS_ORDERED.format(columns=columns_sql, where="")
+        params = ()
+
+    cur = (conn or get_connection()).cursor()
+    try:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cur.close()
+
+def get_last_records(limit=6):
+    """
+    Devuelve una lista de Record, los más recientes primero.
+    Se leen como dicts con claves de la GUI: rec.get("Init Pos", "")
+    """
+    with get_connection() as conn:
+        # ordenamos por created_at DESC para tener los más recientes primero
+        rows = conn.execute(
+            SQL_LAST_RECORDS.format(columns=_RECORD_COLUMNS_SQL), (limit,)
+        ).fetchall()
 
-    return records
+    return [Record(row) for row in rows]
 
 def get_records_by_date(start_date, end_date):
     """
     start_date, end_date: strings 'YYYY-MM-DD'
-    Devuelve lista de dicts como get_last_records, con clave extra '_db_id'.
+    Devuelve lista de Record como get_last_records.
+    Para rangos grandes es mejor usar iter_records().
+    """
+    return list(iter_records(start_date, end_date))
+
+# Filas por página en la tabla paginada de LogsScreen
+PAGE_SIZE = 100
+
+def get_records_page(start_date, end_date, after=None, before=None, limit=PAGE_SIZE):
+    """
+    Una página de registros del rango de fechas, en orden (created_at, id).
+    Paginación por clave (keyset), no por OFFSET, así cada página cuesta
+    lo mismo sin importar cuán lejos esté en el rango:
+
+    - after=(created_at, id):  los `limit` registros siguientes a esa clave.
+    - before=(created_at, id): los `limit` registros anteriores (devueltos
+      también en orden ascendente).
+    - sin after/before: la primera página del rango.
     """
+    params = [*_day_range(start_date, end_date)]
+    keyset, order = "", "ASC"
+    if after is not None:
+        keyset = _KEYSET_AFTER
+        params.extend(after)
+    elif before is not None:
+        keyset = _KEYSET_BEFORE
+        params.extend(before)
+        order = "DESC"
+    params.append(limit)
+
+    sql = SQL_RECORDS_PAGE.format(columns=_RECORD_COLUMNS_SQL, keyset=keyset, order=order)
     with get_connection() as conn:
-        cur = conn.cursor()
+        rows = conn.execute(sql, params).fetchall()
 
-        db_cols = list(DB_TO_GUI.keys())  # ["id_tag", "init_pos", ...]
-        cols_sql = ", ".join(db_cols)
+    if order == "DESC":
+        rows.reverse()
+    return [Record(row) for row in rows]
 
-        cur.execute(
-            f"""
-            SELECT id, {cols_sql}
-            FROM records
-            WHERE date(created_at) BETWEEN date(?) AND date(?)
-            ORDER BY created_at ASC, id ASC
-            """,
-            (start_date, end_date)
-        )
-        rows = cur.fetchall()
+def count_records(start_date, end_date, conn=None):
+    """
+    Cuántos registros hay en el rango de fechas (solo usa el índice).
+    Sin fechas (None, None) cuenta todos.
+    """
+    if start_date or end_date:
+        sql = SQL_COUNT_RECORDS.format(where=_where(_WHERE_DAY_RANGE))
+        params = _day_range(start_date or end_date, end_date or start_date)
+    else:
+        sql, params = SQL_COUNT_RECORDS.format(where=""), ()
 
-    records = []
-    for row in rows:
-        db_id = row[0]
-        data_cols = row[1:]
+    conn = conn or get_connection()
+    return conn.execute(sql, params).fetchone()[0]
 
-        gui_dict = {"_db_id": db_id}
-        for db_col, value in zip(db_cols, data_cols):
-            gui_key = DB_TO_GUI.get(db_col)
-            if gui_key:
-                gui_dict[gui_key] = "" if value is None else str(value)
-        records.append(gui_dict)
+def get_records_in_bbox(min_lat, max_lat, min_lon, max_lon, start_date=None, end_date=None):
+    """
+    Registros cuyo Init Pos o Final Pos cae dentro del rectángulo dado.
+    start_date, end_date: strings 'YYYY-MM-DD' opcionales (ambos inclusive).
+    Devuelve lista de Record como get_records_by_date.
+
+    Usa el índice R*Tree records_rtree para descartar rápido lo que queda
+    lejos; la condición exacta se revisa después sobre las columnas REAL.
+    """
+    cols_sql = ", ".join(f"r.{col}" for col in DB_TO_GUI)
 
-    return records
+    box = {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon}
+    where_date = ""
+    if start_date or end_date:
+        box["start"], box["end"] = _day_range(start_date or end_date, end_date or start_date)
+        where_date = _BBOX_WHERE_DATE
+
+    with get_connection() as conn:
+        template = SQL_RECORDS_IN_BBOX if _has_table(conn, "records_rtree") else SQL_RECORDS_IN_BBOX_SCAN
+        rows = conn.execute(template.format(columns=cols_sql, where_date=where_date), box).fetchall()
+
+    return [Record(row) for row in rows]
 
 def delete_records(db_ids):
     """
@@ -146,68 +497,764 @@ def delete_records(db_ids):
         )
         conn.commit()
 
+def _with_coordinates(db_values):
+    """Agrega init_lat/init_lon/final_lat/final_lon a partir de init_pos/final_pos."""
+    for pos_col, (lat_col, lon_col) in POSITION_COLUMNS.items():
+        if pos_col in db_values:
+            db_values[lat_col], db_values[lon_col] = parse_position(db_values[pos_col])
+    return db_values
+
+def insert_record(whale_id, data_gui):
+    """
+    Inserta un registro. data_gui: dict con claves de la GUI (ya validado).
+    Devuelve el id de la BD del nuevo registro.
+    """
+    db_values = {}
+    for gui_key, value in data_gui.items():
+        if gui_key in GUI_TO_DB:
+            db_values[GUI_TO_DB[gui_key]] = value
+
+    # Asegurarnos de incluir id_tag (A/B/C)
+    db_values.setdefault("id_tag", whale_id)
+    _with_coordinates(db_values)
+
+    fields_sql = ",".join(db_values)
+    placeholders = ",".join(["?"] * len(db_values))
+
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"INSERT INTO records ({fields_sql}) VALUES ({placeholders})",
+            list(db_values.values())
+        )
+        conn.commit()
+        return cur.lastrowid
+
 def update_record_field(db_id, gui_field_name, new_value):
     db_col = GUI_TO_DB.get(gui_field_name)
     if not db_col:
         return
 
+    # si cambian Init Pos / Final Pos, actualizamos también lat/lon
+    db_values = _with_coordinates({db_col: new_value})
+    set_sql = ", ".join(f"{col} = ?" for col in db_values)
+
     with get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
-            f"UPDATE records SET {db_col} = ? WHERE id = ?",
-            (new_value, db_id)
+            f"UPDATE records SET {set_sql} WHERE id = ?",
+            (*db_values.values(), db_id)
         )
         conn.commit()
 
-def get_connection():
-    """Devuelve una conexión a la base de datos."""
-    return sqlite3.connect(DB_PATH)
+# ---------- Ruta general (route_points) ----------
 
-def init_db():
-    """Crea la tabla si no existe."""
+ROUTE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"   # mismo formato que records.created_at
+
+def _route_time(value):
+    """datetime o string 'YYYY-MM-DD HH:MM:SS' -> string para comparar en SQL."""
+    if isinstance(value, datetime):
+        return value.strftime(ROUTE_TIME_FORMAT)
+    return str(value)
+
+def _route_table(raw):
+    return "route_points_raw" if raw else "route_points"
+
+def insert_route_points(route_id, points, raw=False):
+    """
+    Inserta por lotes los puntos de una ruta general en una sola transacción.
+    raw=True los guarda en route_points_raw (puntos sin simplificar).
+    points: iterable de (recorded_at, lat, lon) o (recorded_at, lat, lon, accuracy),
+    con recorded_at datetime o 'YYYY-MM-DD HH:MM:SS' (hora local).
+    Devuelve cuántos puntos se insertaron.
+    Usa una conexión del pool: se llama desde el hilo del registro de ruta.
+    """
+    rows = []
+    for point in points:
+        recorded_at, lat, lon = point[:3]
+        accuracy = point[3] if len(point) > 3 else None
+        rows.append((route_id, _route_time(recorded_at), lat, lon, accuracy))
+    if not rows:
+        return 0
+
+    with pooled_connection() as conn:
+        conn.executemany(
+            f"INSERT INTO {_route_table(raw)} (route_id, recorded_at, lat, lon, accuracy) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+    return len(rows)
+
+def get_route_track(start, end, route_id=None, raw=False):
+    """
+    Puntos de la ruta general entre start y end (ambos inclusive, datetime o
+    'YYYY-MM-DD HH:MM:SS'), ordenados por hora. raw=True lee los puntos crudos.
+    Devuelve lista de tuplas (recorded_at, lat, lon, accuracy).
+    """
+    params = [_route_time(start), _route_time(end)]
+    where_route = ""
+    if route_id is not None:
+        where_route = _WHERE_ROUTE_ID
+        params.append(route_id)
+
+    sql = SQL_ROUTE_TRACK.format(table=_route_table(raw), where_route=where_route)
     with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(
+        return conn.execute(sql, params).fetchall()
+
+def _sighting_window(created_at, init_time, final_time):
+    """
+    (inicio, fin) como datetime a partir de created_at y las horas 'HH:MM:SS'.
+    El registro se guarda al terminar el avistamiento, así que la fecha de
+    created_at es la de Final Time: si Init Time es mayor, fue el día anterior.
+    Devuelve None si faltan datos o no tienen formato válido.
+    """
+    try:
+        day = created_at[:10]
+        start = datetime.strptime(f"{day} {init_time}", ROUTE_TIME_FORMAT)
+        end = datetime.strptime(f"{day} {final_time or init_time}", ROUTE_TIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    if start > end:
+        start -= timedelta(days=1)
+    return start, end
+
+def get_record_time_window(db_id):
+    """
+    (inicio, fin) como datetime del avistamiento db_id: la fecha sale de
+    created_at y las horas de Init Time / Final Time ('HH:MM:SS').
+    Devuelve None si el registro no existe o no tiene horas válidas.
+    """
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT created_at, init_time, final_time FROM records WHERE id = ?",
+            (db_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    return _sighting_window(*row)
+
+def get_track_for_record(db_id, margin_sec=0):
+    """
+    Trayectoria del bote durante el avistamiento db_id (Init Time -> Final Time),
+    con margin_sec segundos extra a cada lado. Lista vacía si no hay ventana.
+    """
+    window = get_record_time_window(db_id)
+    if window is None:
+        return []
+    margin = timedelta(seconds=margin_sec)
+    return get_route_track(window[0] - margin, window[1] + margin)
+
+# ---------- Columnas derivadas (geo) ----------
+
+# columnas calculadas a partir de posiciones y horas; no se muestran en la GUI
+DERIVED_COLUMNS = {
+    "travel_distance_m": "REAL",   # Init Pos -> Final Pos
+    "travel_bearing_deg": "REAL",
+    "travel_speed_kn": "REAL",     # distancia / (Final Time - Init Time)
+    "boat_distance_m": "REAL",     # recorrido del bote (route_points) en ese lapso
+    "boat_speed_kn": "REAL",
+}
+
+def fill_derived_columns(start_date, end_date):
+    """
+    Calcula en bloque las columnas DERIVED_COLUMNS de los registros entre
+    start_date y end_date ('YYYY-MM-DD', ambos inclusive): una consulta para
+    los registros, otra para la ruta del bote, cálculos vectorizados con
+    geo (NumPy si está instalado) y un solo UPDATE por lotes.
+    Devuelve cuántos registros se actualizaron.
+    """
+    start, end = _day_range(start_date, end_date)
+    with get_connection() as conn:
+        rows = conn.execute(SQL_DERIVED_INPUTS, (start, end)).fetchall()
+    if not rows:
+        return 0
+
+    ids = [row[0] for row in rows]
+    windows = [_sighting_window(*row[1:4]) for row in rows]
+    seconds = [(w[1] - w[0]).total_seconds() if w else None for w in windows]
+    init_lat, init_lon, final_lat, final_lon = (list(col) for col in zip(*(row[4:] for row in rows)))
+
+    # desplazamiento de la ballena entre Init Pos y Final Pos
+    distances = geo.to_none(geo.haversine_m(init_lat, init_lon, final_lat, final_lon))
+    bearings = geo.to_none(geo.bearing_deg(init_lat, init_lon, final_lat, final_lon))
+    speeds = geo.to_none(geo.speed_mps(
+        [math.nan if d is None else d for d in distances],
+        [math.nan if t is None else t for t in seconds],
+    ))
+    speeds = [None if v is None else v * geo.MPS_TO_KNOTS for v in speeds]
+
+    boat_distances, boat_speeds = _boat_track_stats(windows)
+
+    with get_connection() as conn:
+        conn.executemany(
+            """
+            UPDATE records
+            SET travel_distance_m = ?, travel_bearing_deg = ?, travel_speed_kn = ?,
+                boat_distance_m = ?, boat_speed_kn = ?
+            WHERE id = ?
+            """,
+            zip(distances, bearings, speeds, boat_distances, boat_speeds, ids)
+        )
+        conn.commit()
+    return len(ids)
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _epoch_seconds(when):
+    """datetime sin zona -> segundos, igual que strftime('%s', ...) de SQLite."""
+    return (when - _EPOCH).total_seconds()
+
+def _merge_windows(windows):
+    """
+    Junta las ventanas que se tocan en tramos disjuntos.
+    Devuelve [(inicio, fin, [índices de las ventanas del tramo])].
+    """
+    order = sorted((w[0], w[1], k) for k, w in enumerate(windows) if w)
+    spans = []
+    for start, end, k in order:
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+            spans[-1][2].append(k)
+        else:
+            spans.append([start, end, [k]])
+    return spans
+
+def _boat_track_stats(windows):
+    """
+    Distancia (m) y velocidad media (nudos) del bote en cada ventana, usando
+    route_points. Solo se leen los puntos de los tramos con avistamientos
+    (ventanas unidas), con la hora ya en segundos desde SQLite; en cada
+    tramo se acumulan las distancias entre puntos y cada ventana se resuelve
+    con dos búsquedas binarias (np.cumsum / np.searchsorted con NumPy).
+    """
+    distances = [None] * len(windows)
+    speeds = [None] * len(windows)
+
+    with get_connection() as conn:
+        for span_start, span_end, members in _merge_windows(windows):
+            rows = conn.execute(
+                SQL_ROUTE_SECONDS.format(table=_route_table(False)),
+                (_route_time(span_start), _route_time(span_end))
+            ).fetchall()
+            if len(rows) < 2:
+                continue
+
+            starts = [_epoch_seconds(windows[k][0]) for k in members]
+            ends = [_epoch_seconds(windows[k][1]) for k in members]
+            span_distances, span_speeds = _span_stats(rows, starts, ends)
+            for k, distance, speed in zip(members, span_distances, span_speeds):
+                distances[k] = distance
+                speeds[k] = speed
+    return distances, speeds
+
+def _span_stats(rows, starts, ends):
+    """rows: (segundos, lat, lon) ordenados; devuelve (distancias, velocidades) por ventana."""
+    if geo.np is not None:
+        np = geo.np
+        data = np.array(rows, dtype=float)
+        times, lats, lons = data[:, 0], data[:, 1], data[:, 2]
+        segments = geo.haversine_m(lats[:-1], lons[:-1], lats[1:], lons[1:])
+        cumulative = np.concatenate(([0.0], np.cumsum(np.nan_to_num(segments))))
+
+        i = np.searchsorted(times, np.asarray(starts), side="left")
+        j = np.searchsorted(times, np.asarray(ends), side="right") - 1
+        valid = j > i
+        i, j = np.minimum(i, len(times) - 1), np.maximum(j, 0)
+        distance = cumulative[j] - cumulative[i]
+        elapsed = times[j] - times[i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed = np.where(elapsed > 0, distance / elapsed * geo.MPS_TO_KNOTS, np.nan)
+        distance = np.where(valid, distance, np.nan)
+        speed = np.where(valid, speed, np.nan)
+        return geo.to_none(distance), geo.to_none(speed)
+
+    times = [float(row[0]) for row in rows]
+    segments, _, _ = geo.track_segments([row[1] for row in rows], [row[2] for row in rows])
+    cumulative = [0.0]
+    for d in segments:
+        cumulative.append(cumulative[-1] + (0.0 if math.isnan(d) else float(d)))
+
+    distances, speeds = [], []
+    for start, end in zip(starts, ends):
+        i = bisect.bisect_left(times, start)
+        j = bisect.bisect_right(times, end) - 1
+        if j <= i:
+            distances.append(None)
+            speeds.append(None)
+            continue
+        distance = cumulative[j] - cumulative[i]
+        distances.append(distance)
+        speeds.append(distance / (times[j] - times[i]) * geo.MPS_TO_KNOTS
+                      if times[j] > times[i] else None)
+    return distances, speeds
+
+def _connect(check_same_thread=True):
+    """
+    Abre una conexión nueva, le aplica los PRAGMA de almacenamiento y la
+    registra para cerrarla en close_connections().
+    Si la carpeta no se puede escribir (p. ej. USB protegido) se abre en solo lectura.
+    """
+    read_only = not _is_writable_location()
+    if read_only:
+        database = f"{DB_PATH.as_uri()}?mode=ro"
+    else:
+        database = DB_PATH
+
+    conn = sqlite3.connect(
+        database,
+        uri=read_only,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=check_same_thread,
+    )
+    _apply_pragmas(conn, read_only)
+    with _connections_lock:
+        _open_connections.append(conn)
+    return conn
+
+def get_connection():
+    """
+    Devuelve la conexión persistente del hilo actual (se crea la primera vez).
+    Se puede seguir usando con `with get_connection() as conn:`: el `with`
+    hace commit/rollback pero NO cierra la conexión, así que se reutiliza.
+    """
+    conn = getattr(_thread_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        _thread_local.conn = conn
+    return conn
+
+@contextmanager
+def pooled_connection():
+    """
+    Presta una conexión del pool para hilos de trabajo de corta vida.
+    Hace commit al salir (o rollback si hubo error) y la devuelve al pool.
+    """
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect(check_same_thread=False)
+
+    try:
+        with conn:
+            yield conn
+    finally:
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            _close(conn)
+
+def release_connection():
+    """Cierra la conexión persistente del hilo actual (al terminar un hilo de trabajo)."""
+    conn = getattr(_thread_local, "conn", None)
+    if conn is not None:
+        _thread_local.conn = None
+        _close(conn)
+
+def _close(conn):
+    with _connections_lock:
+        if conn in _open_connections:
+            _open_connections.remove(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+class _Checkpointer(threading.Thread):
+    """
+    Hilo en segundo plano que pasa el WAL a la BD principal cuando la app
+    está ociosa (el archivo -wal lleva `idle_sec` segundos sin cambios).
+    Así los commits de la GUI nunca pagan el checkpoint.
+    """
+
+    def __init__(self, idle_sec, mode):
+        super().__init__(name="sqlite-checkpointer", daemon=True)
+        self.idle_sec = idle_sec
+        self.mode = mode
+        self._stop_event = threading.Event()
+
+    def run(self):
+        wal_path = DB_PATH.with_name(DB_PATH.name + "-wal")
+        poll = max(1.0, self.idle_sec / 2)
+
+        while not self._stop_event.wait(poll):
+            try:
+                stat = wal_path.stat()
+            except OSError:
+                continue  # no hay WAL todavía
+
+            if stat.st_size == 0:
+                continue
+            if time.time() - stat.st_mtime < self.idle_sec:
+                continue  # hubo escrituras recientes: esperar
+
+            try:
+                with pooled_connection() as conn:
+                    conn.execute(f"PRAGMA wal_checkpoint({self.mode})")
+            except sqlite3.Error as e:
+                print("Checkpoint del WAL falló:", e)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_checkpointer():
+    """Arranca el checkpointer si la BD quedó en modo WAL (llamar tras init_db)."""
+    global _checkpointer
+    if _checkpointer is not None:
+        return
+    if storage_state["read_only"] or storage_state["journal_mode"] != "wal":
+        return
+
+    cfg = _storage_config
+    _checkpointer = _Checkpointer(
+        idle_sec=float(cfg["checkpoint_idle_sec"]),
+        mode=str(cfg["checkpoint_mode"]).upper(),
+    )
+    _checkpointer.start()
+
+def stop_checkpointer():
+    global _checkpointer
+    if _checkpointer is None:
+        return
+    _checkpointer.stop()
+    _checkpointer.join(timeout=5)
+    _checkpointer = None
+
+def _checkpoint_on_close():
+    """Checkpoint final (TRUNCATE por defecto): al cerrar ya no queda nadie escribiendo."""
+    mode = _storage_config.get("checkpoint_on_close")
+    conn = getattr(_thread_local, "conn", None)
+    if not mode or conn is None:
+        return
+    if storage_state["read_only"] or storage_state["journal_mode"] != "wal":
+        return
+    try:
+        conn.execute(f"PRAGMA wal_checkpoint({str(mode).upper()})")
+    except sqlite3.Error as e:
+        print("Checkpoint del WAL al cerrar falló:", e)
+
+def close_connections():
+    """Cierra todas las conexiones abiertas (llamar al cerrar la App)."""
+    stop_checkpointer()
+    _checkpoint_on_close()
+
+    while True:
+        try:
+            _pool.get_nowait()
+        except queue.Empty:
+            break
+
+    with _connections_lock:
+        conns = list(_open_connections)
+        _open_connections.clear()
+
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    _thread_local.conn = None
+
+# ------------------ MIGRACIONES DE ESQUEMA ------------------ #
+# Cada migración es una función (conn, progress) que lleva el esquema de la
+# versión N-1 a la N. La versión aplicada se guarda en PRAGMA user_version.
+# Reglas:
+#   - Solo se agregan migraciones al final de MIGRATIONS, nunca se editan.
+#   - Deben ser idempotentes (IF NOT EXISTS, _add_column...), porque las BD
+#     ya instaladas en campo tienen user_version = 0 aunque la tabla exista.
+
+# Filas por lote en migraciones que recorren la tabla completa
+MIGRATION_BATCH_SIZE = 2000
+
+def _table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def get_column_types(table, conn=None):
+    """{columna: tipo declarado en el esquema} (PRAGMA table_info), p. ej. 'INTEGER'."""
+    conn = conn or get_connection()
+    return {row[1]: (row[2] or "").upper()
+            for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _add_column(conn, table, column, decl):
+    """ALTER TABLE ... ADD COLUMN solo si la columna no existe todavía."""
+    if column not in _table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+def _run_in_batches(conn, select_sql, update_sql, transform,
+                    batch_size=None, progress=None):
+    """
+    Recorre la tabla por lotes usando el id (keyset) y hace commit por lote,
+    para no tener una transacción gigante en BD grandes.
+
+    select_sql: SELECT id, ... FROM tabla WHERE id > ? ORDER BY id LIMIT ?
+    update_sql: sentencia con parámetros para executemany
+    transform:  fila -> tupla de parámetros para update_sql (o None para saltarla)
+    progress:   callback opcional progress(filas_procesadas)
+    """
+    batch_size = batch_size or MIGRATION_BATCH_SIZE
+    last_id = 0
+    done = 0
+    while True:
+        rows = conn.execute(select_sql, (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+
+        params = [p for p in (transform(row) for row in rows) if p is not None]
+        if params:
+            conn.executemany(update_sql, params)
+        conn.commit()
+
+        last_id = rows[-1][0]
+        done += len(rows)
+        if progress:
+            progress(done)
+
+def _migration_1_records_table(conn, progress=None):
+    """Tabla original de registros de ballenas."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_tag TEXT,
+            m_c TEXT,
+            init_pos TEXT,
+            init_time TEXT,
+            final_pos TEXT,
+            final_time TEXT,
+            time_str TEXT,
+            sightings INTEGER,
+            behavior TEXT,
+            blows INTEGER,
+            blow_sample TEXT,
+            first_blow TEXT,
+            whales_count INTEGER,
+            individual_letter TEXT,
+            initial_distance REAL,
+            angle INTEGER,
+            photos_count INTEGER,
+            photo_drone TEXT,
+            fluke TEXT,
+            shallow_dive TEXT,
+            skin_samples INTEGER,
+            feces_trail TEXT,
+            number_feces INTEGER,
+            boats_count INTEGER,
+            boat_speed REAL,
+            ww_whale_distance REAL,
+            engine_on TEXT,
+            visibility TEXT,
+            hydrophone TEXT,
+            observations TEXT,
+            created_at TEXT DEFAULT (datetime('now','localtime'))
+        )
+        """
+    )
+
+def _migration_2_record_indexes(conn, progress=None):
+    """Índices para filtros por fecha y orden de últimos registros."""
+    for name, target in RECORD_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+def _migration_3_position_coordinates(conn, progress=None):
+    """Columnas REAL de lat/lon, rellenadas a partir de init_pos/final_pos."""
+    for lat_col, lon_col in POSITION_COLUMNS.values():
+        _add_column(conn, "records", lat_col, "REAL")
+        _add_column(conn, "records", lon_col, "REAL")
+    conn.commit()
+
+    def transform(row):
+        db_id, init_pos, final_pos = row
+        return (*parse_position(init_pos), *parse_position(final_pos), db_id)
+
+    _run_in_batches(
+        conn,
+        "SELECT id, init_pos, final_pos FROM records WHERE id > ? ORDER BY id LIMIT ?",
+        "UPDATE records SET init_lat = ?, init_lon = ?, final_lat = ?, final_lon = ? WHERE id = ?",
+        transform,
+        progress=progress,
+    )
+
+# Caja (min/max lat/lon) de un registro: cubre Init Pos y Final Pos.
+# Si falta uno de los dos puntos, la caja es solo el otro punto.
+_RTREE_BOX_SQL = """
+    min(coalesce({p}init_lat, {p}final_lat), coalesce({p}final_lat, {p}init_lat)),
+    max(coalesce({p}init_lat, {p}final_lat), coalesce({p}final_lat, {p}init_lat)),
+    min(coalesce({p}init_lon, {p}final_lon), coalesce({p}final_lon, {p}init_lon)),
+    max(coalesce({p}init_lon, {p}final_lon), coalesce({p}final_lon, {p}init_lon))
+"""
+_RTREE_HAS_POS_SQL = "coalesce({p}init_lat, {p}final_lat) IS NOT NULL"
+
+def _has_table(conn, name):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+def _migration_4_spatial_index(conn, progress=None):
+    """Índice R*Tree de posiciones, sincronizado con records mediante triggers."""
+    try:
+        conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                id_tag TEXT,
-                m_c TEXT,
-                init_pos TEXT,   
-                init_time TEXT,
-                final_pos TEXT,
-                final_time TEXT,
-                time_str TEXT,
-                sightings INTEGER,
-                behavior TEXT,
-                blows INTEGER,
-                blow_sample TEXT,
-                first_blow TEXT,
-                whales_count INTEGER,
-                individual_letter TEXT,
-                initial_distance REAL,
-                angle INTEGER,
-                photos_count INTEGER,
-                photo_drone TEXT,
-                fluke TEXT,
-                shallow_dive TEXT,
-                skin_samples INTEGER,
-                feces_trail TEXT,
-                number_feces INTEGER,
-                boats_count INTEGER,
-                boat_speed REAL,
-                ww_whale_distance REAL,
-                engine_on TEXT,
-                visibility TEXT,
-                hydrophone TEXT,
-                observations TEXT,
-                created_at TEXT DEFAULT (datetime('now','localtime'))
-
-            )
+            CREATE VIRTUAL TABLE IF NOT EXISTS records_rtree
+            USING rtree(id, min_lat, max_lat, min_lon, max_lon)
             """
         )
-        
+    except sqlite3.OperationalError as e:
+        # SQLite sin módulo rtree: get_records_in_bbox usa la consulta sin índice
+        print("R*Tree no disponible, se omite el índice espacial:", e)
+        return
+
+    new_box = _RTREE_BOX_SQL.format(p="NEW.")
+    new_has_pos = _RTREE_HAS_POS_SQL.format(p="NEW.")
+    conn.executescript(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS records_rtree_insert
+        AFTER INSERT ON records
+        BEGIN
+            INSERT OR REPLACE INTO records_rtree
+            SELECT NEW.id, {new_box} WHERE {new_has_pos};
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS records_rtree_update
+        AFTER UPDATE OF init_lat, init_lon, final_lat, final_lon ON records
+        BEGIN
+            DELETE FROM records_rtree WHERE id = OLD.id;
+            INSERT INTO records_rtree
+            SELECT NEW.id, {new_box} WHERE {new_has_pos};
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS records_rtree_delete
+        AFTER DELETE ON records
+        BEGIN
+            DELETE FROM records_rtree WHERE id = OLD.id;
+        END;
+        """
+    )
+
+    # rellenar con lo que ya existe, por rangos de id
+    box = _RTREE_BOX_SQL.format(p="")
+    has_pos = _RTREE_HAS_POS_SQL.format(p="")
+    max_id = conn.execute("SELECT coalesce(max(id), 0) FROM records").fetchone()[0]
+    last_id = 0
+    while last_id < max_id:
+        upper = last_id + MIGRATION_BATCH_SIZE
+        conn.execute(
+            f"""
+            INSERT OR REPLACE INTO records_rtree
+            SELECT id, {box} FROM records
+            WHERE id > ? AND id <= ? AND {has_pos}
+            """,
+            (last_id, upper)
+        )
         conn.commit()
+        last_id = upper
+        if progress:
+            progress(min(last_id, max_id))
+
+def _migration_5_route_points(conn, progress=None):
+    """Tabla de puntos de la ruta general (antes solo en CSV sueltos)."""
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS route_points (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            route_id TEXT NOT NULL,
+            recorded_at TEXT NOT NULL,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            accuracy REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_route_points_recorded_at
+            ON route_points(recorded_at);
+        CREATE INDEX IF NOT EXISTS idx_route_points_route_recorded_at
+            ON route_points(route_id, recorded_at);
+        """
+    )
+
+def _migration_6_raw_route_points(conn, progress=None):
+    """Puntos crudos de la ruta general (opcional, antes de simplificar)."""
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS route_points_raw (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            route_id TEXT NOT NULL,
+            recorded_at TEXT NOT NULL,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            accuracy REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_route_points_raw_recorded_at
+            ON route_points_raw(recorded_at);
+        """
+    )
+
+def _migration_7_derived_columns(conn, progress=None):
+    """Columnas derivadas (distancias, rumbo, velocidades); se llenan con fill_derived_columns."""
+    for column, decl in DERIVED_COLUMNS.items():
+        _add_column(conn, "records", column, decl)
+
+# (versión, función) en orden
+MIGRATIONS = [
+    (1, _migration_1_records_table),
+    (2, _migration_2_record_indexes),
+    (3, _migration_3_position_coordinates),
+    (4, _migration_4_spatial_index),
+    (5, _migration_5_route_points),
+    (6, _migration_6_raw_route_points),
+    (7, _migration_7_derived_columns),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, progress=None):
+    """
+    Aplica en orden las migraciones pendientes y devuelve la versión final.
+    Si la BD ya está al día solo cuesta leer PRAGMA user_version.
+    progress: callback opcional progress(version, filas_procesadas)
+    """
+    current = get_schema_version(conn)
+    if current >= SCHEMA_VERSION:
+        return current
+
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+
+        step_progress = None
+        if progress:
+            step_progress = lambda done, v=version: progress(v, done)
+
+        step(conn, step_progress)
+        # user_version no admite parámetros '?'
+        conn.execute(f"PRAGMA user_version = {int(version)}")
+        conn.commit()
+        current = version
+
+    return current
+
+def needs_migration():
+    """True si init_db() tiene migraciones pendientes (la GUI muestra el avance)."""
+    if storage_state["read_only"] or not _is_writable_location():
+        return False
+    return get_schema_version(get_connection()) < SCHEMA_VERSION
+
+def init_db(progress=None):
+    """
+    Crea la tabla si no existe y aplica las migraciones pendientes.
+    Puede correr en un hilo de trabajo (usa la conexión de ese hilo; llamar
+    release_connection() al terminar). progress: como en migrate().
+    """
+    if storage_state["read_only"] or not _is_writable_location():
+        # en medios de solo lectura no se puede crear nada: usamos lo que haya
+        get_connection()
+        return
+
+    conn = get_connection()
+    migrate(conn, progress)
+
 
 def debug_print_all_records():
     """Imprime todas las filas tal cual están en la BD (sin transformar)."""
@@ -221,11 +1268,129 @@ def debug_print_all_records():
         print(row)
     print("----------------------------------------\n")
 
-def backup_database(dest_folder):
+def _query_plan_cases(conn):
+    """
+    (nombre, sql, params, permite_ordenar) de cada consulta de lectura, armada
+    con las mismas constantes SQL_* que usan las funciones.
+    permite_ordenar: el resultado se ordena aparte a propósito (TEMP B-TREE ok).
+    """
+    day_range = _day_range("2000-01-01", "2000-01-31")
+    key = ("2000-01-10 00:00:00", 1)
+    track_range = ("2000-01-10 08:00:00", "2000-01-10 09:00:00")
+    cols = _RECORD_COLUMNS_SQL
+
+    cases = [
+        ("get_last_records", SQL_LAST_RECORDS.format(columns=cols), (6,), False),
+        ("iter_records",
+         SQL_RECORDS_ORDERED.format(columns=cols, where=""), (), False),
+        ("iter_records(fechas)",
+         SQL_RECORDS_ORDERED.format(columns=cols, where=_where(_WHERE_DAY_RANGE)),
+         day_range, False),
+        ("iter_records(id_tag)",
+         SQL_RECORDS_ORDERED.format(columns=cols, where=_where(_WHERE_ID_TAG)),
+         ("A",), False),
+        ("iter_records(fechas, id_tag)",
+         SQL_RECORDS_ORDERED.format(columns=cols, where=_where(_WHERE_DAY_RANGE, _WHERE_ID_TAG)),
+         (*day_range, "A"), False),
+        ("get_records_page",
+         SQL_RECORDS_PAGE.format(columns=cols, keyset="", order="ASC"),
+         (*day_range, PAGE_SIZE), False),
+        ("get_records_page(after)",
+         SQL_RECORDS_PAGE.format(columns=cols, keyset=_KEYSET_AFTER, order="ASC"),
+         (*day_range, *key, PAGE_SIZE), False),
+        ("get_records_page(before)",
+         SQL_RECORDS_PAGE.format(columns=cols, keyset=_KEYSET_BEFORE, order="DESC"),
+         (*day_range, *key, PAGE_SIZE), False),
+        ("count_records", SQL_COUNT_RECORDS.format(where=""), (), False),
+        ("count_records(fechas)",
+         SQL_COUNT_RECORDS.format(where=_where(_WHERE_DAY_RANGE)), day_range, False),
+        ("fill_derived_columns", SQL_DERIVED_INPUTS, day_range, False),
+    ]
+
+    for raw in (False, True):
+        table = _route_table(raw)
+        if _has_table(conn, table):
+            cases.append((f"get_route_track({table})",
+                          SQL_ROUTE_TRACK.format(table=table, where_route=""),
+                          track_range, False))
+            cases.append((f"_boat_track_stats({table})",
+                          SQL_ROUTE_SECONDS.format(table=table), track_range, False))
+            cases.append((f"get_route_track({table}, route_id)",
+                          SQL_ROUTE_TRACK.format(table=table, where_route=_WHERE_ROUTE_ID),
+                          (*track_range, "general_route_1"), False))
+
+    if _has_table(conn, "records_rtree"):
+        box = {"min_lat": 27.0, "max_lat": 28.0, "min_lon": -113.0, "max_lon": -112.0,
+               "start": day_range[0], "end": day_range[1]}
+        bbox_cols = ", ".join(f"r.{col}" for col in DB_TO_GUI)
+        # los candidatos salen del R*Tree sin orden: ordenarlos es parte del plan
+        for where_date in ("", _BBOX_WHERE_DATE):
+            name = "get_records_in_bbox" + ("(fechas)" if where_date else "")
+            cases.append((name,
+                          SQL_RECORDS_IN_BBOX.format(columns=bbox_cols, where_date=where_date),
+                          box, True))
+    return cases
+
+def check_query_plans():
+    """
+    Revisa con EXPLAIN QUERY PLAN las consultas de lectura de la GUI.
+    Devuelve una lista de problemas (vacía si todas usan índices); sirve
+    para detectar que alguien volvió a escribir un filtro que recorre
+    toda la tabla, p. ej. `WHERE date(created_at) ...`.
+    """
+    problems = []
+    with get_connection() as conn:
+        for name, sql, params, sorts in _query_plan_cases(conn):
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            for detail in plan:
+                full_scan = detail.startswith("SCAN") and "INDEX" not in detail
+                if full_scan or ("TEMP B-TREE" in detail and not sorts):
+                    problems.append(f"{name}: {detail}")
+    return problems
+
+# páginas por paso del backup en línea y pausa entre pasos (deja escribir a otros)
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+
+def backup_to(dest_path, pages=None, progress=None):
+    """
+    Copia consistente de la BD en dest_path con la API de backup de SQLite
+    (sqlite3.Connection.backup), sin copiar el archivo vivo.
+
+    - Con journal_mode=WAL se copia en un solo paso: en WAL el lector no
+      bloquea a los que escriben, y así el backup no se reinicia cada vez
+      que alguien guarda.
+    - Si no, se copia de a `pages` páginas (BACKUP_PAGES_PER_STEP) con una
+      pausa entre pasos, para no bloquear las escrituras mucho tiempo.
+    La copia queda en modo DELETE (un solo archivo) y se escribe como
+    <dest>.part y se renombra al terminar. progress(status, remaining, total).
+    """
+    dest_path = Path(dest_path)
+    tmp_path = dest_path.with_name(dest_path.name + ".part")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    with pooled_connection() as src:
+        if pages is None:
+            wal = src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            pages = -1 if wal else BACKUP_PAGES_PER_STEP
+
+        dst = sqlite3.connect(tmp_path)
+        try:
+            src.backup(dst, pages=pages, progress=progress, sleep=BACKUP_STEP_SLEEP)
+            dst.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            dst.close()
+
+    os.replace(tmp_path, dest_path)
+    return str(dest_path)
+
+def backup_database(dest_folder, progress=None):
     """
     Crea una copia de la base de datos en dest_folder.
     El nombre incluirá un timestamp para no sobrescribir:
     database_backup_YYYYMMDD_HHMMSS.db
+    La copia se hace en línea (backup_to), no copiando el archivo.
     """
     src = DB_PATH
     if not src.exists():
@@ -235,5 +1400,4 @@ def backup_database(dest_folder):
     backup_name = f"{src.stem}_backup_{timestamp}{src.suffix}"  # ej: database_backup_20251203_204455.db
     dest_path = Path(dest_folder) / backup_name
 
-    shutil.copy2(src, dest_path)
-    return str(dest_path)
+    return backup_to(dest_path, progress=progress)
@@ -0,0 +1,16 @@
+import database
+from tk_worker import TkWorker
+
+
+class DBWorker(TkWorker):
+    """
+    Hilo único que ejecuta las llamadas a la base de datos fuera del loop de Tk
+    (ver TkWorker). Al terminar, cierra la conexión de SQLite de su hilo.
+    """
+
+    def __init__(self, tk_root, poll_ms=50, on_busy_change=None, name="db-worker"):
+        super().__init__(tk_root, poll_ms=poll_ms, on_busy_change=on_busy_change, name=name)
+
+    def _on_thread_exit(self):
+        # la conexión de este hilo no la puede cerrar el hilo de Tk
+        database.release_connection()
@@ -0,0 +1,397 @@
+import csv
+import gzip
+import io
+import os
+import threading
+import time
+
+import database
+
+# pyarrow es opcional: solo hace falta para exportar Parquet / Arrow IPC
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# zstandard es opcional: solo hace falta para CSV comprimido con zstd
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Columnas del archivo exportado, en orden: (encabezado, expresión SQL).
+# La fecha y la hora salen de created_at ya separadas en la consulta, así
+# cada fila del cursor se escribe tal cual, sin armarla campo por campo.
+EXPORT_HEADERS = [
+    "fecha", "# Sightings", "hora", "ID", "M-C", "Init Latitude", "Init Longitude", "Init Time",
+    "Final Latitude", "Final Longitude", "Final Time",
+    "Surface Time", "Behavior", "# Blows", "Blow Sample", "First Blow", "# Whales",
+    "Individual (letter)", "Initial Distance", "Angle", "# Photos", "Photo Drone", "Fluke", "Shallow dive",
+    "# Skin Sample", "Feces", "# Feces", "# Boats", "Boat Speed", "WW-Whale Distance", "Engine On",
+    "# Visibility", "Hydrophone", "Observations",
+]
+
+_SPECIAL_COLUMNS = {
+    "fecha": "substr(created_at, 1, 10)",
+    "hora": "substr(created_at, 12)",
+}
+
+# Proyección precalculada: encabezado -> expresión SQL (una sola vez, al importar)
+EXPORT_PROJECTION = [
+    _SPECIAL_COLUMNS.get(header) or database.GUI_TO_DB[header]
+    for header in EXPORT_HEADERS
+]
+
+EXPORT_TAGS = ("A", "B", "C")
+
+# formato -> extensión del archivo
+EXPORT_FORMATS = {
+    "csv": ".csv",
+    "csv.gz": ".csv.gz",
+    "csv.zst": ".csv.zst",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+# filas por RecordBatch en Parquet / Arrow
+ARROW_BATCH_SIZE = 5000
+
+
+class ExportNotAvailable(Exception):
+    """El formato pedido necesita una librería que no está instalada."""
+    pass
+
+
+def check_format(fmt):
+    """Lanza ExportNotAvailable (o ValueError) si no se puede exportar en `fmt`."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación desconocido: {fmt}")
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise ExportNotAvailable(
+            "La librería 'pyarrow' no está instalada. "
+            "Instala con: pip install pyarrow"
+        )
+    if fmt == "csv.zst" and zstandard is None:
+        raise ExportNotAvailable(
+            "La librería 'zstandard' no está instalada. "
+            "Instala con: pip install zstandard"
+        )
+
+
+def available_formats():
+    """Formatos que se pueden usar con las librerías instaladas."""
+    formats = []
+    for fmt in EXPORT_FORMATS:
+        try:
+            check_format(fmt)
+        except ExportNotAvailable:
+            continue
+        formats.append(fmt)
+    return formats
+
+
+# ------------------ TIPOS (desde el esquema) ------------------ #
+
+def export_column_types(conn=None):
+    """
+    Tipo de cada columna exportada ('INTEGER', 'REAL' o 'TEXT'), sacado del
+    esquema de records (PRAGMA table_info), no de los valores de la GUI.
+    Las columnas calculadas (fecha, hora) son TEXT.
+    """
+    schema = database.get_column_types("records", conn=conn)
+    types = []
+    for header, expr in zip(EXPORT_HEADERS, EXPORT_PROJECTION):
+        declared = "TEXT" if header in _SPECIAL_COLUMNS else schema.get(expr, "TEXT")
+        if "INT" in declared:
+            types.append("INTEGER")
+        elif "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+            types.append("REAL")
+        else:
+            types.append("TEXT")
+    return types
+
+
+def _coerce(value, kind):
+    """
+    Valor de SQLite -> tipo de la columna. SQLite no obliga los tipos (la
+    ballena C se guarda sin validar), así que lo que no se puede convertir
+    queda vacío (None) en lugar de romper el archivo tipado; _ArrowWriter
+    cuenta esas celdas en `coerced`.
+    """
+    if value is None or value == "":
+        return None
+    try:
+        if kind == "INTEGER":
+            return int(value)
+        if kind == "REAL":
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+def _arrow_schema(types):
+    arrow_types = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+    return pa.schema([
+        pa.field(header, arrow_types[kind]) for header, kind in zip(EXPORT_HEADERS, types)
+    ])
+
+
+# ------------------ ESCRITORES POR FORMATO ------------------ #
+
+class _CSVWriter:
+    """CSV (texto plano o comprimido con gzip / zstd)."""
+
+    def __init__(self, path, fmt):
+        self._raw = None
+        if fmt == "csv.gz":
+            self._file = gzip.open(path, "wt", newline="", encoding="utf-8")
+        elif fmt == "csv.zst":
+            self._raw = open(path, "wb")
+            stream = zstandard.ZstdCompressor().stream_writer(self._raw)
+            self._file = io.TextIOWrapper(stream, newline="", encoding="utf-8")
+        else:
+            self._file = open(path, mode="w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(EXPORT_HEADERS)
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+        if self._raw is not None and not self._raw.closed:
+            self._raw.close()
+
+
+class _ArrowWriter:
+    """Parquet o Arrow IPC: junta filas tipadas y escribe de a RecordBatch."""
+
+    def __init__(self, path, fmt, types, batch_size=ARROW_BATCH_SIZE):
+        self._types = types
+        self._schema = _arrow_schema(types)
+        self._batch_size = batch_size
+        self._columns = [[] for _ in types]
+        self._rows = 0
+        self.coerced = 0    # celdas que no eran del tipo de la columna
+        self._sink = None
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self._schema)
+
+    def write(self, row):
+        for column, value, kind in zip(self._columns, row, self._types):
+            typed = _coerce(value, kind)
+            if typed is None and value is not None and value != "":
+                self.coerced += 1
+            column.append(typed)
+        self._rows += 1
+        if self._rows >= self._batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        batch = pa.record_batch(
+            [pa.array(col, type=field.type) for col, field in zip(self._columns, self._schema)],
+            schema=self._schema,
+        )
+        self._writer.write_batch(batch)
+        self._columns = [[] for _ in self._types]
+        self._rows = 0
+
+    def close(self):
+        try:
+            self._flush()
+        finally:
+            self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+
+
+def _open_writer(path, fmt, types):
+    if fmt in ("parquet", "arrow"):
+        return _ArrowWriter(path, fmt, types)
+    return _CSVWriter(path, fmt)
+
+
+# ------------------ EXPORTAR ------------------ #
+
+class ExportCancelled(Exception):
+    """Se canceló la exportación (no queda ningún archivo a medias)."""
+    pass
+
+
+# cada cuántas filas se avisa el progreso y se revisa la cancelación
+PROGRESS_EVERY = 1000
+
+# sufijo de los archivos mientras se escriben; se renombran al terminar
+TEMP_SUFFIX = ".part"
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def export_records(folder, start_date=None, end_date=None, last=None,
+                   suffix="", tags=EXPORT_TAGS, fmt="csv", batch_size=None,
+                   progress=None, cancel=None, stats=None):
+    """
+    Exporta los registros a un archivo por ballena (whale_<tag>_logs<suffix><ext>)
+    en una sola pasada: database.iter_projection lee el cursor por lotes
+    (fetchmany) y cada fila va al writer de su id_tag. La memoria no depende
+    del tamaño del rango.
+
+    start_date, end_date: 'YYYY-MM-DD' (ambos inclusive); sin fechas se usan
+    los últimos `last` registros, o todos si last=None.
+    fmt: una clave de EXPORT_FORMATS. Parquet / Arrow usan los tipos del
+    esquema (export_column_types), no texto.
+    progress(filas_hechas, total): callback opcional cada PROGRESS_EVERY filas.
+    cancel: threading.Event opcional; si se activa, lanza ExportCancelled.
+    stats: dict opcional; al terminar queda stats["coerced"] = celdas que no
+    coincidían con el tipo de su columna (Parquet / Arrow) y salieron vacías.
+
+    Los archivos se escriben como <nombre>.part y solo al terminar bien se
+    renombran (os.replace, atómico); si falla o se cancela, se borran.
+    Usa una conexión del pool, así puede correr en un hilo de trabajo.
+    Solo se crean archivos para las ballenas que tienen registros.
+    Devuelve {tag: ruta} de los archivos escritos.
+    """
+    check_format(fmt)
+    extension = EXPORT_FORMATS[fmt]
+
+    writers = {}
+    paths = {}
+    done = False
+    try:
+        with database.pooled_connection() as conn:
+            types = export_column_types(conn) if fmt in ("parquet", "arrow") else None
+            total = database.count_records(start_date, end_date, conn=conn)
+            if last is not None and not (start_date or end_date):
+                total = min(total, int(last))
+
+            rows = database.iter_projection(
+                ["id_tag", *EXPORT_PROJECTION], start_date, end_date, last, batch_size,
+                conn=conn
+            )
+            try:
+                for count, row in enumerate(rows, 1):
+                    if count % PROGRESS_EVERY == 0:
+                        if cancel is not None and cancel.is_set():
+                            raise ExportCancelled()
+                        if progress:
+                            progress(count, total)
+
+                    tag = row[0]
+                    writer = writers.get(tag)
+                    if writer is None:
+                        if tag not in tags:
+                            continue
+                        # el archivo se abre con el primer registro de esa ballena
+                        path = os.path.join(folder, f"whale_{tag}_logs{suffix}{extension}")
+                        writer = writers[tag] = _open_writer(path + TEMP_SUFFIX, fmt, types)
+                        paths[tag] = path
+                    writer.write(row[1:])
+            finally:
+                rows.close()
+
+        if cancel is not None and cancel.is_set():
+            raise ExportCancelled()
+
+        coerced = 0
+        for writer in writers.values():
+            writer.close()
+            coerced += getattr(writer, "coerced", 0)
+        writers.clear()
+        for path in paths.values():
+            os.replace(path + TEMP_SUFFIX, path)
+        done = True
+        if stats is not None:
+            stats["coerced"] = coerced
+        if progress:
+            progress(total, total)
+    finally:
+        if not done:
+            for writer in writers.values():
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+            for path in paths.values():
+                _remove_quietly(path + TEMP_SUFFIX)
+
+    return paths
+
+
+class ExportJob(threading.Thread):
+    """
+    Exportación en segundo plano (no bloquea la GUI).
+    La GUI consulta rows_done / total / rows_per_sec / percent y done;
+    al terminar quedan result ({tag: ruta}) o error (excepción, incluida
+    ExportCancelled), y coerced_cells (celdas vaciadas por no coincidir con
+    el tipo de la columna). cancel() la detiene en el próximo bloque de filas.
+    """
+
+    def __init__(self, folder, **export_kwargs):
+        super().__init__(name="export-job", daemon=True)
+        self.folder = folder
+        self.export_kwargs = export_kwargs
+
+        self.rows_done = 0
+        self.total = 0
+        self.coerced_cells = 0
+        self.started_at = None
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100.0 if self.done else 0.0
+        return 100.0 * self.rows_done / self.total
+
+    @property
+    def rows_per_sec(self):
+        if self.started_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self.started_at
+        return self.rows_done / elapsed if elapsed > 0 else 0.0
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _on_progress(self, rows_done, total):
+        self.rows_done = rows_done
+        self.total = total
+
+    def run(self):
+        self.started_at = time.monotonic()
+        stats = {}
+        try:
+            self.result = export_records(
+                self.folder, progress=self._on_progress, cancel=self._cancel,
+                stats=stats, **self.export_kwargs
+            )
+            self.coerced_cells = stats.get("coerced", 0)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
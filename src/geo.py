@@ -0,0 +1,133 @@
+import math
+
+# NumPy es opcional: con NumPy los cálculos se hacen sobre arreglos completos
+# en una sola llamada; sin NumPy se usa el mismo cálculo punto a punto.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EARTH_RADIUS_M = 6_371_008.8
+MPS_TO_KNOTS = 1.0 / 0.514444
+
+
+# ------------------ CÁLCULOS VECTORIZADOS ------------------ #
+# Todas las funciones aceptan escalares o secuencias (listas / arreglos) de
+# grados decimales. Con NumPy devuelven arreglos; sin NumPy, listas (o un
+# float si se pasaron escalares). Los valores faltantes (None/NaN) dan NaN.
+
+def _is_scalar(value):
+    return not hasattr(value, "__len__")
+
+
+def _as_array(values):
+    return np.asarray(values, dtype=float)
+
+
+def _as_float(value):
+    return math.nan if value is None else float(value)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distancia en metros sobre la esfera entre (lat1, lon1) y (lat2, lon2)."""
+    if np is not None:
+        phi1, phi2 = np.radians(_as_array(lat1)), np.radians(_as_array(lat2))
+        dphi = phi2 - phi1
+        dlmb = np.radians(_as_array(lon2) - _as_array(lon1))
+        a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+        result = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        return float(result) if result.ndim == 0 else result
+
+    if _is_scalar(lat1):
+        return _haversine_one(lat1, lon1, lat2, lon2)
+    return [_haversine_one(*args) for args in zip(lat1, lon1, lat2, lon2)]
+
+
+def _haversine_one(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(_as_float, (lat1, lon1, lat2, lon2))
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    if math.isnan(a):
+        return math.nan
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+
+
+def bearing_deg(lat1, lon1, lat2, lon2):
+    """Rumbo inicial (0–360°, 0 = norte, sentido horario) de 1 hacia 2."""
+    if np is not None:
+        phi1, phi2 = np.radians(_as_array(lat1)), np.radians(_as_array(lat2))
+        dlmb = np.radians(_as_array(lon2) - _as_array(lon1))
+        y = np.sin(dlmb) * np.cos(phi2)
+        x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlmb)
+        result = np.degrees(np.arctan2(y, x)) % 360.0
+        return float(result) if result.ndim == 0 else result
+
+    if _is_scalar(lat1):
+        return _bearing_one(lat1, lon1, lat2, lon2)
+    return [_bearing_one(*args) for args in zip(lat1, lon1, lat2, lon2)]
+
+
+def _bearing_one(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(_as_float, (lat1, lon1, lat2, lon2))
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dlmb = math.radians(lon2 - lon1)
+    y = math.sin(dlmb) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(dlmb)
+    if math.isnan(x) or math.isnan(y):
+        return math.nan
+    return math.degrees(math.atan2(y, x)) % 360.0
+
+
+def speed_mps(distance_m, seconds):
+    """Velocidad (m/s) = distancia / tiempo; NaN si el tiempo es 0 o falta."""
+    if np is not None:
+        d, t = _as_array(distance_m), _as_array(seconds)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = np.where(t > 0, d / t, np.nan)
+        return float(result) if result.ndim == 0 else result
+
+    if _is_scalar(distance_m):
+        return _speed_one(distance_m, seconds)
+    return [_speed_one(d, t) for d, t in zip(distance_m, seconds)]
+
+
+def _speed_one(distance_m, seconds):
+    d, t = _as_float(distance_m), _as_float(seconds)
+    return d / t if t > 0 else math.nan
+
+
+# ------------------ TRACKS ------------------ #
+
+def track_segments(lats, lons, seconds=None):
+    """
+    Segmentos entre puntos consecutivos de un track.
+    Devuelve (distancias_m, rumbos_deg, velocidades_mps); las velocidades
+    solo si se pasan los tiempos `seconds` (segundos, p. ej. timestamp()).
+    Cada resultado tiene un elemento menos que el track.
+    """
+    if len(lats) < 2:
+        return [], [], ([] if seconds is not None else None)
+
+    distances = haversine_m(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    bearings = bearing_deg(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    speeds = None
+    if seconds is not None:
+        if np is not None:
+            dt = np.diff(_as_array(seconds))
+        else:
+            dt = [b - a for a, b in zip(seconds[:-1], seconds[1:])]
+        speeds = speed_mps(distances, dt)
+    return distances, bearings, speeds
+
+
+def track_length_m(lats, lons):
+    """Distancia total recorrida (m) por un track, ignorando tramos sin posición."""
+    distances, _, _ = track_segments(lats, lons)
+    return sum(d for d in distances if not math.isnan(d))
+
+
+def to_none(values):
+    """Convierte NaN en None (para guardar en SQLite) y devuelve una lista de float/None."""
+    return [None if math.isnan(v) else float(v) for v in values]
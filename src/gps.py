@@ -1,7 +1,14 @@
 import json
+import csv
+import math
+import random
 import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple, Callable, NamedTuple, List
 
 # Intentamos importar winrt (para el sensor GNSS de Windows)
 try:
@@ -9,12 +16,45 @@ try:
 except ImportError:
     Geolocator = None
 
+# pyserial es opcional: solo hace falta para leer NMEA desde un puerto serie
+try:
+    import serial
+except ImportError:
+    serial = None
+
 # Archivo donde guardamos la configuración del GPS
 CONFIG_PATH = Path(__file__).resolve().parent / "gps_config.json"
 
 # Configuración por defecto
 DEFAULT_CONFIG = {
-    "use_mock": True,     # True = modo simulado, False = usar GNSS real
+    # use_mock=True usa el simulador (claves sim_*) sin importar "provider";
+    # es lo mismo que use_mock=False con provider="simulator"
+    "use_mock": True,     # True = modo simulado, False = usar "provider"
+    "stream_enabled": False,      # True = leer posiciones continuamente en segundo plano
+    "stream_interval_sec": 1.0,   # cada cuánto se pide un fix en modo stream
+    "stream_buffer_size": 600,    # cuántos fixes recientes se guardan (ring buffer)
+    "max_fix_age_sec": 5.0,       # un fix más viejo que esto no se usa
+    "provider": "winrt",          # fuente si use_mock=False: winrt / nmea / replay / simulator
+    "nmea_port": None,            # p. ej. "COM3" o "/dev/ttyUSB0"
+    "nmea_baudrate": 4800,
+    "nmea_file": None,            # archivo .nmea en lugar de puerto serie
+    "replay_file": None,          # track grabado (CSV de General Route o NMEA)
+    "replay_speed": 1.0,          # 10.0 = reproduce 10 veces más rápido
+    "replay_loop": True,
+    # provider "simulator": bote y ballenas en movimiento (ver TrajectorySimulator)
+    "sim_origin": [27.505, -112.005],
+    "sim_rate_hz": 10.0,          # 1–50 Hz
+    "sim_boat_speed_kn": 8.0,
+    "sim_whale_speed_kn": 3.0,
+    "sim_noise_m": 5.0,           # ruido gaussiano por eje
+    "sim_dropout": 0.02,          # probabilidad de perder cada fix
+    "sim_latency_ms": 100,        # retraso entre la medición y la entrega
+    "sim_seed": None,             # fijar para tracks reproducibles
+    # ruta general: simplificación antes de guardar (ver track_simplify)
+    "route_tolerance_m": 5.0,     # desvío máximo del track simplificado (0 = sin simplificar)
+    "route_min_distance_m": 2.0,  # descartar puntos más cerca que esto del anterior...
+    "route_max_interval_sec": 60.0,  # ...salvo que haya pasado este tiempo
+    "route_keep_raw": False,      # guardar también los puntos crudos (route_points_raw)
 }
 
 
@@ -23,92 +63,893 @@ class GPSNotAvailable(Exception):
     pass
 
 
-def load_config() -> Dict:
-    """Carga configuración de gps_config.json o devuelve DEFAULT_CONFIG."""
-    if CONFIG_PATH.exists():
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        cfg = DEFAULT_CONFIG.copy()
-        cfg.update(data)
-        return cfg
-    return DEFAULT_CONFIG.copy()
+class Fix(NamedTuple):
+    """Una lectura de posición con su hora (time.time()) y precisión en metros."""
+    timestamp: float
+    lat: float
+    lon: float
+    accuracy: Optional[float] = None
 
 
-def save_config(config: Dict) -> None:
-    """Guarda configuración en gps_config.json."""
+def format_position(lat: float, lon: float) -> str:
+    """(lat, lon) -> 'lat, lon' con 6 decimales, el formato que guarda la app."""
+    return f"{lat:.6f}, {lon:.6f}"
+
+
+# Cache de la configuración en memoria: (mtime del archivo, config)
+_config_cache: Optional[Tuple[Optional[int], Dict]] = None
+_config_checked_at = 0.0
+_config_lock = threading.Lock()
+
+# Cada cuánto get_config() revisa si cambió el mtime de gps_config.json
+CONFIG_CHECK_INTERVAL_SEC = 2.0
+
+
+def _config_mtime() -> Optional[int]:
+    try:
+        return CONFIG_PATH.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_config_file() -> Dict:
     cfg = DEFAULT_CONFIG.copy()
-    cfg.update(config)
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(cfg, f, indent=2, ensure_ascii=False)
+    if CONFIG_PATH.exists():
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            cfg.update(json.load(f))
+    return cfg
 
 
-# ------------------ MODO SIMULADO ------------------ #
+def load_config() -> Dict:
+    """
+    Carga configuración de gps_config.json o devuelve DEFAULT_CONFIG.
+    Se guarda en memoria y solo se vuelve a leer si cambia el mtime del archivo.
+    Devuelve una copia: modificarla no afecta la cache.
+    """
+    global _config_cache, _config_checked_at
+    mtime = _config_mtime()
+    with _config_lock:
+        if _config_cache is None or _config_cache[0] != mtime:
+            _config_cache = (mtime, _read_config_file())
+        _config_checked_at = time.monotonic()
+        return dict(_config_cache[1])
 
-def _get_mock_position(whale_id: Optional[str] = None) -> str:
+
+def get_config() -> Dict:
     """
-    Devuelve coordenadas simuladas.
-    Puedes ajustarlas a tu zona de estudio real.
+    Configuración para las lecturas de posición: sale de la cache sin copiarla,
+    y el mtime del archivo se revisa como mucho cada CONFIG_CHECK_INTERVAL_SEC.
+    Solo lectura: no modificar el dict devuelto.
     """
-    if whale_id == "A":
-        return "27.500000, -112.000000"
-    elif whale_id == "B":
-        return "27.510000, -112.010000"
-    else:
-        return "27.505000, -112.005000"
+    if (_config_cache is None
+            or time.monotonic() - _config_checked_at >= CONFIG_CHECK_INTERVAL_SEC):
+        load_config()
+    return _config_cache[1]
 
 
-# ------------------ MODO REAL (GNSS) ------------------ #
+def reload_config() -> Dict:
+    """Fuerza a releer gps_config.json (p. ej. si se editó a mano)."""
+    global _config_cache
+    with _config_lock:
+        _config_cache = None
+    return load_config()
+
 
-async def _get_location_async(timeout_sec: float = 10.0):
+def save_config(config: Dict) -> None:
     """
-    Usa el sensor de ubicación de Windows (GNSS) para obtener lat/lon.
+    Guarda configuración en gps_config.json y actualiza la cache.
+    Solo cambia las claves de `config`; el resto (stream, etc.) se conserva.
     """
+    global _config_cache, _config_checked_at
+    cfg = load_config()
+    cfg.update(config)
+    with _config_lock:
+        with open(CONFIG_PATH, "w", encoding="utf-8") as f:
+            json.dump(cfg, f, indent=2, ensure_ascii=False)
+        _config_cache = (_config_mtime(), cfg)
+        _config_checked_at = time.monotonic()
+
+
+# ------------------ MODO REAL (GNSS) ------------------ #
+
+def _default_locator_factory():
+    """Crea el Geolocator de Windows (winrt)."""
     if Geolocator is None:
         raise GPSNotAvailable(
             "La librería 'winrt' no está instalada. "
             "Instala con: pip install winrt"
         )
+    return Geolocator()
+
+
+class GNSSSession:
+    """
+    Sesión GNSS de larga vida: un event loop propio corriendo en un hilo
+    y un único locator reutilizado entre lecturas.
+    Evita crear/cerrar un loop (asyncio.run) y un Geolocator() por cada fix.
+
+    locator_factory: función sin argumentos que devuelve un objeto con
+    `get_geoposition_async()` (awaitable cuyo resultado tiene
+    .coordinate.point.position.latitude/longitude). Por defecto es el
+    Geolocator de winrt; en pruebas se puede pasar uno falso.
+    """
+
+    def __init__(self, locator_factory: Optional[Callable[[], object]] = None):
+        self._locator_factory = locator_factory or _default_locator_factory
+        self._locator = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="gnss-loop", daemon=True
+                )
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    async def _read_async(self, timeout_sec: float):
+        if self._locator is None:
+            self._locator = self._locator_factory()
+
+        try:
+            pos = await asyncio.wait_for(
+                self._locator.get_geoposition_async(), timeout=timeout_sec
+            )
+        except asyncio.TimeoutError:
+            raise GPSNotAvailable("Tiempo de espera agotado esperando fix de GPS.")
+        except GPSNotAvailable:
+            raise
+        except Exception:
+            # locator en mal estado: se vuelve a crear en la próxima lectura
+            self._locator = None
+            raise
+
+        coord = pos.coordinate.point.position
+        accuracy = getattr(pos.coordinate, "accuracy", None)
+        return Fix(time.time(), coord.latitude, coord.longitude, accuracy)
+
+    def get_fix(self, timeout_sec: float = 10.0) -> Fix:
+        """Lee un Fix de forma bloqueante desde cualquier hilo."""
+        loop = self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(self._read_async(timeout_sec), loop)
+        # margen extra por si el loop está ocupado con otra lectura
+        return future.result(timeout=timeout_sec + 1.0)
+
+    def get_position(self, timeout_sec: float = 10.0) -> Tuple[float, float]:
+        """Lee un fix (lat, lon) de forma bloqueante desde cualquier hilo."""
+        fix = self.get_fix(timeout_sec)
+        return fix.lat, fix.lon
+
+    def close(self) -> None:
+        """Detiene el loop y suelta el locator."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        self._locator = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=2.0)
+        loop.close()
 
-    locator = Geolocator()
 
+_gnss_session: Optional[GNSSSession] = None
+_gnss_session_lock = threading.Lock()
+
+
+def get_gnss_session() -> GNSSSession:
+    """Sesión GNSS compartida por toda la app (se crea la primera vez)."""
+    global _gnss_session
+    with _gnss_session_lock:
+        if _gnss_session is None:
+            _gnss_session = GNSSSession()
+        return _gnss_session
+
+
+def set_locator_factory(locator_factory: Optional[Callable[[], object]]) -> GNSSSession:
+    """
+    Reemplaza la sesión GNSS por una nueva con otro locator
+    (p. ej. uno falso para probar en Linux). None = Geolocator de winrt.
+    """
+    global _gnss_session
+    with _gnss_session_lock:
+        old, _gnss_session = _gnss_session, GNSSSession(locator_factory)
+        new = _gnss_session
+    if old is not None:
+        old.close()
+    return new
+
+
+def close_gnss_session() -> None:
+    """Cierra la sesión GNSS (llamar al cerrar la App)."""
+    global _gnss_session
+    with _gnss_session_lock:
+        session, _gnss_session = _gnss_session, None
+    if session is not None:
+        session.close()
+
+
+# ------------------ PROVEEDORES DE POSICIÓN ------------------ #
+# Todas las fuentes de posición implementan GPSProvider.read_fix().
+# La fuente se elige con "provider" en gps_config.json:
+#   "winrt"  -> sensor GNSS de Windows (por defecto si use_mock=False)
+#   "nmea"   -> NMEA 0183 desde un puerto serie (nmea_port) o archivo (nmea_file)
+#   "replay" -> reproduce un track grabado (replay_file) a replay_speed x
+#   "simulator" -> tracks simulados en movimiento (claves sim_*)
+# Con use_mock=True siempre se usa "simulator" (el modo de prueba de la
+# pantalla de configuración), sin mirar "provider".
+
+class GPSProvider:
+    """Interfaz común de las fuentes de posición."""
+
+    name = "base"
+    paced = False       # True si read_fix() ya espera a la tasa del receptor
+    per_whale = False   # True si read_fix(whale_id) da otra posición por ballena
+
+    def read_fix(self, whale_id: Optional[str] = None, timeout_sec: float = 10.0) -> Fix:
+        """Devuelve un Fix (bloqueante) o lanza GPSNotAvailable."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Libera el recurso (puerto, archivo...). Por defecto no hace nada."""
+        pass
+
+
+class WinRTProvider(GPSProvider):
+    """Sensor GNSS de Windows a través de la sesión compartida."""
+
+    name = "winrt"
+
+    def read_fix(self, whale_id=None, timeout_sec=10.0):
+        return get_gnss_session().get_fix(timeout_sec)
+
+
+def _nmea_checksum_ok(sentence: str) -> bool:
+    """Valida el checksum '*hh' (XOR de los caracteres entre '$' y '*')."""
+    if "*" not in sentence:
+        return True  # algunos equipos no lo mandan
+    body, _, checksum = sentence[1:].partition("*")
+    calc = 0
+    for ch in body:
+        calc ^= ord(ch)
+    try:
+        return calc == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+def _nmea_coord(value: str, hemisphere: str) -> Optional[float]:
+    """'ddmm.mmmm' / 'dddmm.mmmm' + N/S/E/W -> grados decimales."""
+    if not value or not hemisphere:
+        return None
     try:
-        pos = await asyncio.wait_for(locator.get_geoposition_async(), timeout=timeout_sec)
-    except asyncio.TimeoutError:
-        raise GPSNotAvailable("Tiempo de espera agotado esperando fix de GPS.")
+        raw = float(value)
+    except ValueError:
+        return None
+    degrees = int(raw // 100)
+    coord = degrees + (raw - degrees * 100) / 60.0
+    return -coord if hemisphere in ("S", "W") else coord
+
+
+def _nmea_time_of_day(value: str) -> Optional[float]:
+    """'hhmmss.ss' -> segundos desde la medianoche UTC."""
+    if len(value) < 6:
+        return None
+    try:
+        return int(value[0:2]) * 3600 + int(value[2:4]) * 60 + float(value[4:])
+    except ValueError:
+        return None
+
+
+# Error aproximado (m) por unidad de HDOP, para estimar la precisión de un GGA
+NMEA_UERE_M = 5.0
+
+# Al reproducir un archivo NMEA, un salto entre fixes mayor que esto (o la
+# vuelta al inicio) se espera como un intervalo normal del receptor
+NMEA_FILE_MAX_GAP_SEC = 10.0
+NMEA_FILE_DEFAULT_GAP_SEC = 1.0
+
+
+def parse_nmea_sentence(line: str) -> Optional[Fix]:
+    """
+    Interpreta una sentencia GGA o RMC (cualquier talker: GP, GN, GL...).
+    Devuelve un Fix cuyo timestamp es la hora UTC del día en segundos
+    (la de la sentencia), o None si no es una posición válida.
+    """
+    line = line.strip()
+    if not line.startswith("$") or not _nmea_checksum_ok(line):
+        return None
+
+    fields = line.split("*")[0].split(",")
+    kind = fields[0][-3:]
+
+    if kind == "GGA" and len(fields) >= 9:
+        if fields[6] in ("", "0"):   # calidad 0 = sin fix
+            return None
+        lat = _nmea_coord(fields[2], fields[3])
+        lon = _nmea_coord(fields[4], fields[5])
+        try:
+            accuracy = float(fields[8]) * NMEA_UERE_M
+        except ValueError:
+            accuracy = None
+    elif kind == "RMC" and len(fields) >= 7:
+        if fields[2] != "A":         # V = dato no válido
+            return None
+        lat = _nmea_coord(fields[3], fields[4])
+        lon = _nmea_coord(fields[5], fields[6])
+        accuracy = None
+    else:
+        return None
+
+    seconds = _nmea_time_of_day(fields[1])
+    if lat is None or lon is None or seconds is None:
+        return None
+    return Fix(seconds, lat, lon, accuracy)
+
+
+class NMEAProvider(GPSProvider):
+    """
+    Lee NMEA 0183 de un puerto serie (requiere pyserial) o de un archivo.
+    Cada read_fix() consume líneas hasta encontrar una posición válida.
+    Con un archivo, al llegar al final vuelve a empezar si loop=True (si
+    una vuelta entera no tiene ninguna posición, lanza GPSNotAvailable), y
+    los fixes se entregan al ritmo de la hora de las sentencias, como los
+    daría el receptor.
+    """
+
+    name = "nmea"
+    paced = True    # el puerto serie (o el ritmo del archivo) marca la tasa
+
+    def __init__(self, port: Optional[str] = None, baudrate: int = 4800,
+                 path: Optional[str] = None, loop: bool = True):
+        if not port and not path:
+            raise GPSNotAvailable("Configura 'nmea_port' o 'nmea_file' para usar NMEA.")
+        self.port = port
+        self.baudrate = baudrate
+        self.path = path
+        self.loop = loop
+        self._source = None
+        self._lock = threading.Lock()
+        # último fix entregado desde el archivo: (hora NMEA, time.monotonic())
+        self._last_file_fix = None
+
+    def _open(self):
+        if self.path:
+            return open(self.path, "r", encoding="ascii", errors="replace")
+        if serial is None:
+            raise GPSNotAvailable(
+                "La librería 'pyserial' no está instalada. "
+                "Instala con: pip install pyserial"
+            )
+        try:
+            return serial.Serial(self.port, self.baudrate, timeout=1.0)
+        except serial.SerialException as e:
+            raise GPSNotAvailable(f"No se pudo abrir el puerto {self.port}: {e}")
+
+    def _readline(self) -> Optional[str]:
+        line = self._source.readline()
+        if isinstance(line, bytes):
+            line = line.decode("ascii", errors="replace")
+        return line
 
-    coord = pos.coordinate.point.position
-    return coord.latitude, coord.longitude
+    def read_fix(self, whale_id=None, timeout_sec=10.0):
+        deadline = time.monotonic() + timeout_sec
+        with self._lock:
+            if self._source is None:
+                self._source = self._open()
+
+            rewinds = 0
+            while time.monotonic() < deadline:
+                line = self._readline()
+                if not line:
+                    if self.path and self.loop:
+                        # volvió a llegar al final sin fix: el archivo no tiene ninguno
+                        if rewinds:
+                            raise GPSNotAvailable("El archivo NMEA no tiene ninguna posición válida.")
+                        rewinds += 1
+                        self._source.seek(0)
+                        continue
+                    if self.path:
+                        raise GPSNotAvailable("Fin del archivo NMEA.")
+                    continue  # serie: timeout de lectura, seguir esperando
+
+                fix = parse_nmea_sentence(line)
+                if fix is None:
+                    continue
+                if self.path and not self._wait_file_fix(fix.timestamp, deadline):
+                    continue  # otra sentencia de la misma época (GGA + RMC)
+                # para la app, la hora del fix es la de lectura
+                return fix._replace(timestamp=time.time())
+
+        raise GPSNotAvailable("Tiempo de espera agotado esperando fix NMEA.")
+
+    def _wait_file_fix(self, fix_time, deadline):
+        """
+        Espera lo que separa este fix del anterior en el archivo (según la
+        hora de las sentencias). Devuelve False si es de la misma época que
+        el anterior y hay que saltarlo.
+        """
+        last = self._last_file_fix
+        if last is not None:
+            gap = (fix_time - last[0]) % 86400     # cruza la medianoche
+            if gap == 0:
+                return False
+            if gap > NMEA_FILE_MAX_GAP_SEC:
+                gap = NMEA_FILE_DEFAULT_GAP_SEC
+            wait = min(last[1] + gap, deadline) - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self._last_file_fix = (fix_time, time.monotonic())
+        return True
+
+    def close(self):
+        with self._lock:
+            if self._source is not None:
+                self._source.close()
+                self._source = None
+
+
+def load_track(path: str) -> List[Fix]:
+    """
+    Carga un track grabado: CSV de General Route (fecha, hora, latitud, longitud)
+    o un archivo NMEA. Los timestamps quedan relativos al primer punto (segundos).
+    """
+    points = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        first_line = f.readline()
+        f.seek(0)
+
+        if first_line.startswith("$"):
+            day_offset = 0.0
+            last = None
+            for line in f:
+                fix = parse_nmea_sentence(line)
+                if fix is None:
+                    continue
+                if last is not None and fix.timestamp + day_offset < last - 43200:
+                    day_offset += 86400.0   # pasó la medianoche UTC
+                t = fix.timestamp + day_offset
+                if last is not None and t == last:
+                    continue  # GGA y RMC del mismo segundo
+                last = t
+                points.append(fix._replace(timestamp=t))
+        else:
+            for row in csv.DictReader(f):
+                try:
+                    ts = datetime.strptime(f"{row['fecha']} {row['hora']}", "%Y-%m-%d %H:%M:%S")
+                    lat, lon = float(row["latitud"]), float(row["longitud"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                points.append(Fix(ts.timestamp(), lat, lon, None))
+
+    if not points:
+        raise GPSNotAvailable(f"El track {path} no tiene posiciones válidas.")
+
+    t0 = points[0].timestamp
+    return [p._replace(timestamp=p.timestamp - t0) for p in points]
+
+
+class ReplayProvider(GPSProvider):
+    """
+    Reproduce un track grabado a `speed` veces el tiempo real.
+    read_fix() devuelve el punto que corresponde al tiempo transcurrido
+    desde la primera lectura (sin esperar), como lo haría un GPS en vivo.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: Optional[str] = None, speed: float = 1.0,
+                 loop: bool = True, track: Optional[List[Fix]] = None):
+        if track is None:
+            if not path:
+                raise GPSNotAvailable("Configura 'replay_file' para usar replay.")
+            track = load_track(path)
+        self.track = track
+        self.speed = speed
+        self.loop = loop
+        self._started_at: Optional[float] = None
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def read_fix(self, whale_id=None, timeout_sec=10.0):
+        now = time.monotonic()
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = now
+            elapsed = (now - self._started_at) * self.speed
+
+            duration = self.track[-1].timestamp
+            if elapsed > duration:
+                if not self.loop:
+                    raise GPSNotAvailable("El track de replay terminó.")
+                elapsed = elapsed % duration if duration > 0 else 0.0
+                if elapsed < self.track[self._index].timestamp:
+                    self._index = 0
+
+            # avanzar hasta el último punto con timestamp <= elapsed
+            while (self._index + 1 < len(self.track)
+                   and self.track[self._index + 1].timestamp <= elapsed):
+                self._index += 1
+            point = self.track[self._index]
+
+        return point._replace(timestamp=time.time())
+
+
+# ------------------ SIMULADOR DE TRAYECTORIAS ------------------ #
+# Proveedor "simulator": bote y ballenas A/B/C que se mueven, con la tasa de
+# actualización, ruido, pérdidas de fix y latencia de gps_config.json (sim_*).
+# Sirve para probar la pantalla de tracking y el registro de ruta sin hardware.
+
+METERS_PER_DEG_LAT = 111_320.0
+
+
+class _SimTrack:
+    """Un objeto que se mueve en el plano local (x = este, y = norte, en metros)."""
+
+    def __init__(self, x: float, y: float, heading: float, speed: float):
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.speed = speed
+
+
+class TrajectorySimulator(GPSProvider):
+    """
+    Genera tracks en movimiento a `rate_hz` (1–50 Hz):
+      - whale_id None  -> bote (lo que lee el stream / General Route)
+      - whale_id A/B/C -> cada ballena, con su propio rumbo
+    Las ballenas deambulan alrededor del origen y el bote sigue a la A.
+    read_fix() espera al siguiente tick como un receptor real; con
+    probabilidad `dropout` el tick se pierde, y el fix se entrega
+    `latency_sec` después de su hora de medición (Fix.timestamp).
+    """
+
+    name = "simulator"
+    paced = True
+    per_whale = True
+
+    WHALE_IDS = ("A", "B", "C")
+    WANDER_RADIUS_M = 2000.0    # las ballenas vuelven si se alejan más que esto
+    TURN_SD_RAD = 0.15          # giro aleatorio por segundo (desviación estándar)
+
+    def __init__(self, origin: Tuple[float, float] = (27.505, -112.005),
+                 rate_hz: float = 10.0, boat_speed_kn: float = 8.0,
+                 whale_speed_kn: float = 3.0, noise_m: float = 5.0,
+                 dropout: float = 0.02, latency_sec: float = 0.1,
+                 seed: Optional[int] = None):
+        self.origin_lat, self.origin_lon = origin
+        self.rate_hz = min(max(float(rate_hz), 1.0), 50.0)
+        self.dt = 1.0 / self.rate_hz
+        self.noise_m = max(float(noise_m), 0.0)
+        self.dropout = min(max(float(dropout), 0.0), 0.95)
+        self.latency_sec = max(float(latency_sec), 0.0)
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._m_per_deg_lon = METERS_PER_DEG_LAT * math.cos(math.radians(self.origin_lat))
+
+        boat_speed = boat_speed_kn * 0.514444     # nudos -> m/s
+        whale_speed = whale_speed_kn * 0.514444
+        self._boat = _SimTrack(-500.0, -500.0, self._rng.uniform(0, 2 * math.pi), boat_speed)
+        self._whales = {
+            wid: _SimTrack(self._rng.uniform(-800, 800), self._rng.uniform(-800, 800),
+                           self._rng.uniform(0, 2 * math.pi), whale_speed)
+            for wid in self.WHALE_IDS
+        }
+
+        self._start = time.time()
+        self._tick = 0          # último tick simulado
+
+    # ---------- modelo ---------- #
+
+    @staticmethod
+    def _steer(track: _SimTrack, target_x: float, target_y: float, weight: float) -> None:
+        """Gira el rumbo una fracción `weight` hacia el punto objetivo."""
+        wanted = math.atan2(target_x - track.x, target_y - track.y)
+        diff = (wanted - track.heading + math.pi) % (2 * math.pi) - math.pi
+        track.heading += diff * weight
+
+    def _step(self) -> None:
+        dt = self.dt
+        turn_sd = self.TURN_SD_RAD * math.sqrt(dt)
+
+        for whale in self._whales.values():
+            whale.heading += self._rng.gauss(0.0, turn_sd)
+            if math.hypot(whale.x, whale.y) > self.WANDER_RADIUS_M:
+                self._steer(whale, 0.0, 0.0, 0.5 * dt)
+            whale.x += math.sin(whale.heading) * whale.speed * dt
+            whale.y += math.cos(whale.heading) * whale.speed * dt
+
+        # el bote sigue a la ballena A y frena al acercarse (~300 m)
+        boat, target = self._boat, self._whales["A"]
+        boat.heading += self._rng.gauss(0.0, turn_sd)
+        self._steer(boat, target.x, target.y, 0.3 * dt)
+        distance = math.hypot(target.x - boat.x, target.y - boat.y)
+        speed = boat.speed * min(1.0, distance / 300.0)
+        boat.x += math.sin(boat.heading) * speed * dt
+        boat.y += math.cos(boat.heading) * speed * dt
+
+    def _advance_to(self, tick: int) -> None:
+        while self._tick < tick:
+            self._step()
+            self._tick += 1
+
+    def _to_fix(self, track: _SimTrack, timestamp: float) -> Fix:
+        x = track.x + self._rng.gauss(0.0, self.noise_m)
+        y = track.y + self._rng.gauss(0.0, self.noise_m)
+        lat = self.origin_lat + y / METERS_PER_DEG_LAT
+        lon = self.origin_lon + x / self._m_per_deg_lon
+        return Fix(timestamp, lat, lon, self.noise_m or None)
+
+    # ---------- GPSProvider ---------- #
+
+    def read_fix(self, whale_id=None, timeout_sec=10.0):
+        deadline = time.time() + timeout_sec
+        while True:
+            # siguiente tick que todavía no se entregó (la latencia se solapa
+            # con las mediciones siguientes, como en un receptor real)
+            elapsed = time.time() - self.latency_sec - self._start
+            tick = max(int(elapsed / self.dt) + 1, 1)
+            measured_at = self._start + tick * self.dt
+            ready_at = measured_at + self.latency_sec
+            if ready_at > deadline:
+                raise GPSNotAvailable("Simulador: tiempo de espera agotado sin fix.")
+
+            wait = ready_at - time.time()
+            if wait > 0:
+                time.sleep(wait)
+
+            with self._lock:
+                self._advance_to(tick)
+                if self._rng.random() < self.dropout:
+                    continue  # fix perdido: esperar al siguiente
+                track = self._whales.get(whale_id, self._boat)
+                return self._to_fix(track, measured_at)
+
+
+def _create_simulator(cfg: Dict) -> TrajectorySimulator:
+    origin = cfg.get("sim_origin") or (27.505, -112.005)
+    return TrajectorySimulator(
+        origin=(float(origin[0]), float(origin[1])),
+        rate_hz=float(cfg.get("sim_rate_hz", 10.0)),
+        boat_speed_kn=float(cfg.get("sim_boat_speed_kn", 8.0)),
+        whale_speed_kn=float(cfg.get("sim_whale_speed_kn", 3.0)),
+        noise_m=float(cfg.get("sim_noise_m", 5.0)),
+        dropout=float(cfg.get("sim_dropout", 0.02)),
+        latency_sec=float(cfg.get("sim_latency_ms", 100)) / 1000.0,
+        seed=cfg.get("sim_seed"),
+    )
+
+
+def create_provider(cfg: Dict) -> GPSProvider:
+    """Construye el proveedor indicado en la configuración."""
+    name = "simulator" if cfg.get("use_mock", True) else cfg.get("provider", "winrt")
+    if name == "winrt":
+        return WinRTProvider()
+    if name == "nmea":
+        return NMEAProvider(
+            port=cfg.get("nmea_port"),
+            baudrate=int(cfg.get("nmea_baudrate", 4800)),
+            path=cfg.get("nmea_file"),
+        )
+    if name == "simulator":
+        return _create_simulator(cfg)
+    if name == "replay":
+        return ReplayProvider(
+            path=cfg.get("replay_file"),
+            speed=float(cfg.get("replay_speed", 1.0)),
+            loop=bool(cfg.get("replay_loop", True)),
+        )
+    raise GPSNotAvailable(f"Proveedor de GPS desconocido: {name}")
+
+
+# claves de la config que obligan a reconstruir el proveedor si cambian
+_PROVIDER_KEYS = ("use_mock", "provider", "nmea_port", "nmea_baudrate", "nmea_file",
+                  "replay_file", "replay_speed", "replay_loop",
+                  "sim_origin", "sim_rate_hz", "sim_boat_speed_kn", "sim_whale_speed_kn",
+                  "sim_noise_m", "sim_dropout", "sim_latency_ms", "sim_seed")
+
+_provider: Optional[GPSProvider] = None
+_provider_key: Optional[Tuple] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> GPSProvider:
+    """Proveedor actual según gps_config.json (se reconstruye si cambia la config)."""
+    global _provider, _provider_key
+    cfg = get_config()
+    key = tuple(repr(cfg.get(k)) for k in _PROVIDER_KEYS)
+    with _provider_lock:
+        if _provider is None or key != _provider_key:
+            old = _provider
+            _provider = create_provider(cfg)
+            _provider_key = key
+            if old is not None:
+                old.close()
+        return _provider
+
+
+def close_provider() -> None:
+    global _provider, _provider_key
+    with _provider_lock:
+        provider, _provider, _provider_key = _provider, None, None
+    if provider is not None:
+        provider.close()
+
+
+# ------------------ STREAM DE POSICIONES EN SEGUNDO PLANO ------------------ #
+
+class PositionStream:
+    """
+    Hilo que pide fixes continuamente y los guarda en un ring buffer.
+    Así Start/Stop pueden leer la última posición (o la más cercana a la
+    hora en que se presionó el botón) sin esperar al GPS.
+
+    read_fix: función sin argumentos que devuelve un Fix (bloqueante).
+    """
+
+    def __init__(self, read_fix: Callable[[], Fix], interval_sec: float = 1.0,
+                 buffer_size: int = 600):
+        self.read_fix = read_fix
+        self.interval_sec = interval_sec
+        self._fixes = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[Exception] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="gps-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                fix = self.read_fix()
+            except Exception as e:
+                self.last_error = e
+            else:
+                self.last_error = None
+                with self._lock:
+                    self._fixes.append(fix)
+
+            # descontar lo que tardó la lectura para mantener la cadencia
+            wait = self.interval_sec - (time.monotonic() - started)
+            if wait > 0:
+                self._stop_event.wait(wait)
+
+    def latest(self, max_age_sec: Optional[float] = None) -> Optional[Fix]:
+        """Último fix, o None si no hay o es más viejo que max_age_sec."""
+        with self._lock:
+            if not self._fixes:
+                return None
+            fix = self._fixes[-1]
+        if max_age_sec is not None and time.time() - fix.timestamp > max_age_sec:
+            return None
+        return fix
+
+    def closest(self, at: float, max_age_sec: Optional[float] = None) -> Optional[Fix]:
+        """Fix cuya hora está más cerca de `at` (time.time()), dentro de max_age_sec."""
+        with self._lock:
+            fixes = list(self._fixes)
+        if not fixes:
+            return None
+        fix = min(fixes, key=lambda f: abs(f.timestamp - at))
+        if max_age_sec is not None and abs(fix.timestamp - at) > max_age_sec:
+            return None
+        return fix
+
+
+_position_stream: Optional[PositionStream] = None
+
+
+def get_position_stream() -> Optional[PositionStream]:
+    """Stream en marcha, o None si no se inició."""
+    stream = _position_stream
+    if stream is not None and stream.running:
+        return stream
+    return None
+
+
+def start_position_stream() -> Optional[PositionStream]:
+    """
+    Arranca el stream de posiciones si la config lo pide (stream_enabled).
+    El stream lee la posición del bote (whale_id=None). Devuelve el stream
+    o None.
+    """
+    global _position_stream
+    cfg = get_config()
+    if not cfg.get("stream_enabled"):
+        return None
+    if get_position_stream() is not None:
+        return _position_stream
+
+    # si el proveedor ya marca el ritmo (simulador), leer cada fix que entregue
+    interval = 0.0 if get_provider().paced else float(cfg["stream_interval_sec"])
+    _position_stream = PositionStream(
+        read_fix=lambda: get_provider().read_fix(),
+        interval_sec=interval,
+        buffer_size=int(cfg["stream_buffer_size"]),
+    )
+    _position_stream.start()
+    return _position_stream
+
+
+def stop_position_stream() -> None:
+    global _position_stream
+    stream, _position_stream = _position_stream, None
+    if stream is not None:
+        stream.stop()
 
 
 # ------------------ API PÚBLICA USADA POR LA APP ------------------ #
 
-def get_current_position(whale_id: Optional[str] = None) -> str:
+def get_current_position(whale_id: Optional[str] = None, at: Optional[float] = None) -> str:
     """
     Devuelve 'lat, lon' como string.
 
-    - Si use_mock=True  -> devuelve posiciones simuladas.
-    - Si use_mock=False -> intenta usar el sensor GNSS real.
+    Usa el proveedor de get_provider(): el simulador si use_mock=True, o el
+    de "provider" (GNSS real, NMEA, replay, simulator).
+    Con el stream en marcha responde al instante con el último fix (o el
+    más cercano a `at`, la hora time.time() en que se presionó el botón)
+    si no es más viejo que max_fix_age_sec; si no, lee un fix nuevo.
+    El stream guarda la posición del bote, así que no se usa para una
+    ballena si el proveedor da una posición propia por ballena (per_whale).
+    La configuración sale de la cache en memoria (ver get_config()).
     """
-    cfg = load_config()
+    cfg = get_config()
 
-    # ----- MODO SIMULADO -----
-    if cfg.get("use_mock", True):
-        return _get_mock_position(whale_id)
+    stream = get_position_stream()
+    if stream is not None and whale_id is not None and get_provider().per_whale:
+        stream = None
+    if stream is not None:
+        max_age = float(cfg["max_fix_age_sec"])
+        fix = stream.closest(at, max_age) if at is not None else stream.latest(max_age)
+        if fix is not None:
+            return format_position(fix.lat, fix.lon)
 
-    # ----- MODO REAL (GNSS) -----
     try:
-        lat, lon = asyncio.run(_get_location_async())
-        return f"{lat:.6f}, {lon:.6f}"
+        fix = get_provider().read_fix(whale_id)
+        return format_position(fix.lat, fix.lon)
     except Exception as e:
-        print("Error leyendo GPS real:", e)
+        print("Error leyendo GPS:", e)
         return "GPS_ERROR"
 
 
 def test_connection(config: Optional[Dict] = None):
     """
     Función pensada para tu ConfigScreen:
-    Prueba que se pueda obtener una posición REAL (GNSS).
-    Ignoramos 'config' porque con el sensor GNSS no usamos puerto COM.
+    Prueba que se pueda obtener una posición del proveedor configurado.
+    Si se pasa 'config', se prueba ese proveedor sin cambiar el actual.
     """
-    lat, lon = asyncio.run(_get_location_async(timeout_sec=10.0))
-    return lat, lon
+    if config is None:
+        fix = get_provider().read_fix(timeout_sec=10.0)
+        return fix.lat, fix.lon
+
+    provider = create_provider({**get_config(), **config})
+    try:
+        fix = provider.read_fix(timeout_sec=10.0)
+    finally:
+        if not isinstance(provider, WinRTProvider):
+            provider.close()
+    return fix.lat, fix.lon
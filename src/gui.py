@@ -1,11 +1,55 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 from datetime import datetime
-import csv
 import sys, os
 import time
 import os
+import itertools
 import gps
+import database
+import backup
+from route_logger import RouteLogger
+from track_simplify import TrackSimplifier
+
+# Texto que se muestra en Init/Final Pos mientras se espera el fix del GPS
+GPS_PENDING = "Getting GPS..."
+
+# Registros que muestra (y exporta) la pantalla de Logs sin filtro de fechas
+RECENT_LOGS_LIMIT = 20
+
+def _run_inline(fn, *args, on_done=None, on_error=None, **kwargs):
+    """Corre fn en el hilo de Tk (sin hilo de trabajo) con el mismo contrato on_done / on_error."""
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        if on_error is None:
+            raise
+        on_error(e)
+        return
+    if on_done:
+        on_done(result)
+
+def run_gps(handlers, whale_id, at, on_done=None, on_error=None):
+    """
+    Pide la posición (fix más cercano a `at`) en el hilo de GPS
+    (handlers["capture_position"]) y entrega el resultado a on_done en el
+    hilo de Tk. Si no hay hilo de GPS, la pide en línea.
+    """
+    if "capture_position" in handlers:
+        handlers["capture_position"](whale_id, at, on_done=on_done, on_error=on_error)
+        return
+    _run_inline(handlers["get_current_position"], whale_id, at=at,
+                on_done=on_done, on_error=on_error)
+
+def run_db(handlers, fn, *args, on_done=None, on_error=None, **kwargs):
+    """
+    Ejecuta fn en el hilo de BD (handlers["run_db"]) y entrega el resultado a
+    on_done / on_error en el hilo de Tk. Si no hay hilo de BD, la corre en línea.
+    """
+    if "run_db" in handlers:
+        handlers["run_db"](fn, *args, on_done=on_done, on_error=on_error, **kwargs)
+        return
+    _run_inline(fn, *args, on_done=on_done, on_error=on_error, **kwargs)
 
 class StartScreen(tk.Frame):
     def __init__(self, parent, app, handlers, *args, **kwargs):
@@ -248,43 +292,86 @@ class TrackingScreen(tk.Frame):
 
         start_times = {}        # whale_id -> t0 (float) o None
         stop_snapshot = {}      # whale_id -> {"elapsed": float, "final_time": str, "final_pos": str} o None
+        pending_captures = {}   # whale_id -> posiciones GPS que todavía no llegan
+        capture_tokens = {}     # id(widget) -> captura vigente de ese campo
+        save_pending = set()    # ballenas con un Save esperando sus posiciones
+
+        def set_widget_value(widget, value):
+            if isinstance(widget, tk.StringVar):
+                widget.set(value)
+            else:
+                widget.delete(0, "end")
+                widget.insert(0, value)
+
+        def capture_position(whale_id, pressed_at, widget, fallback, on_captured=None):
+            """
+            Pide la posición sin bloquear la pantalla: el campo muestra
+            GPS_PENDING y se llena cuando llega el fix (el más cercano a
+            pressed_at, la hora del botón). Si antes de que llegue se pidió
+            otra posición para el mismo campo, el resultado viejo se descarta.
+            on_captured(pos) se llama cuando la posición ya está en el campo.
+            """
+            if "get_current_position" not in handlers:
+                # placeholder si aún no tienes lógica real de posición
+                set_widget_value(widget, fallback)
+                if on_captured:
+                    on_captured(fallback)
+                return
+
+            token = object()
+            capture_tokens[id(widget)] = token
+            pending_captures[whale_id] = pending_captures.get(whale_id, 0) + 1
+            set_widget_value(widget, GPS_PENDING)
+
+            def on_done(pos):
+                pending_captures[whale_id] -= 1
+                if capture_tokens.get(id(widget)) is not token:
+                    return  # llegó tarde: ya hay otra captura para este campo
+                del capture_tokens[id(widget)]
+                set_widget_value(widget, pos)
+                if on_captured:
+                    on_captured(pos)
+
+            def on_error(e):
+                print("Error obteniendo posición GPS:", e)
+                on_done("GPS_ERROR")
+
+            run_gps(handlers, whale_id, pressed_at, on_done=on_done, on_error=on_error)
+
+        def when_positions_ready(whale_id, callback):
+            """Llama callback() cuando no quedan posiciones pendientes de esa ballena."""
+            if pending_captures.get(whale_id, 0) > 0:
+                self.after(100, lambda: when_positions_ready(whale_id, callback))
+            else:
+                callback()
+
         def on_start_whale(whale_id):
             """
             Start: guarda hora de inicio y escribe Init Pos automáticamente.
             """
+            if whale_id in save_pending:
+                messagebox.showwarning(
+                    "Guardando",
+                    f"Espera a que termine de guardarse el registro de la ballena {whale_id}."
+                )
+                return
+
             set_status_tracking(whale_id)
             row = get_whale_row(whale_id)
 
-            # 1) guardar la hora actual
-            start_times[whale_id] = time.time()
+            # 1) guardar la hora actual (la del botón, no la del fix)
+            pressed_at = time.time()
+            start_times[whale_id] = pressed_at
             stop_snapshot[whale_id] = None   # nuevo start invalida cualquier stop anterior
+            capture_tokens.pop(id(row[IDX_FINAL_POS]), None)   # y su Final Pos pendiente
 
-            # 2) obtener posición actual (aquí decides de dónde sale)
-            #    Por ahora:
-            # pos = ""
-            if "get_current_position" in handlers:
-                # si tienes un handler en main que devuelve la posición
-                pos = handlers["get_current_position"](whale_id)
-            else:
-                # placeholder si aún no tienes lógica real de posición
-                pos = "AUTO_POS"
+            # 2) Init Pos: se pide en segundo plano; queda GPS_PENDING hasta que llega
+            #    (con el stream de GPS activo, el fix más cercano a pressed_at)
+            capture_position(whale_id, pressed_at, row[IDX_INIT_POS], "AUTO_POS")
 
-            # 3) escribir en Init Pos
-            widget_init = row[IDX_INIT_POS]
-            if isinstance(widget_init, tk.StringVar):
-                widget_init.set(pos)
-            else:
-                widget_init.delete(0, "end")
-                widget_init.insert(0, pos)
-
-            # 4) Escribir en Init Time la hora actual
-            init_time = time.strftime("%H:%M:%S", time.localtime())  # Formato: "YYYY-MM-DD HH:MM:SS"
-            widget_init_time = row[IDX_INIT_TIME]  # Asumimos que IDX_INIT_TIME es el índice correcto para el campo de Init Time
-            if isinstance(widget_init_time, tk.StringVar):
-                widget_init_time.set(init_time)
-            else:
-                widget_init_time.delete(0, "end")
-                widget_init_time.insert(0, init_time)
+            # 3) Escribir en Init Time la hora del botón
+            init_time = time.strftime("%H:%M:%S", time.localtime(pressed_at))  # Formato: "HH:MM:SS"
+            set_widget_value(row[IDX_INIT_TIME], init_time)
 
             # (opcional) limpiar Final Pos y Time
             widget_final = row[IDX_FINAL_POS]
@@ -296,15 +383,40 @@ class TrackingScreen(tk.Frame):
                     w.set(val)
                 else:
                     w.delete(0, "end")
-            
+
             stop_gone_counter(whale_id)
-        
-        def on_stop_whale(whale_id):
+
+        def record_stop(whale_id, t0):
             """
-            Stop: calcula tiempo desde Start, y escribe Final Pos y Time.
+            Congela el stop: duración y Final Time con la hora del botón;
+            Final Pos llega en segundo plano.
             """
             row = get_whale_row(whale_id)
+            pressed_at = time.time()
+            elapsed = pressed_at - t0
+            final_time = time.strftime("%H:%M:%S", time.localtime(pressed_at))
 
+            # >>> guardar el ÚLTIMO STOP (freeze)
+            snapshot = {"elapsed": elapsed, "final_time": final_time, "final_pos": GPS_PENDING}
+            stop_snapshot[whale_id] = snapshot
+
+            # 1) Final Pos
+            def on_captured(pos):
+                snapshot["final_pos"] = pos
+            capture_position(whale_id, pressed_at, row[IDX_FINAL_POS], "AUTO_POS_END", on_captured)
+
+            # 2) Time (duración)
+            set_widget_value(row[IDX_TIME], format_elapsed(elapsed))
+
+            # 3) Escribir la hora de finalización (Final Time)
+            set_widget_value(row[IDX_FINAL_TIME], final_time)
+
+            start_gone_counter(whale_id)
+
+        def on_stop_whale(whale_id):
+            """
+            Stop: calcula tiempo desde Start, y escribe Final Pos y Time.
+            """
             t0 = start_times.get(whale_id)
             if t0 is None:
                 messagebox.showwarning(
@@ -313,55 +425,62 @@ class TrackingScreen(tk.Frame):
                 )
                 return
 
-            elapsed = time.time() - t0
+            record_stop(whale_id, t0)
 
-            # 1) Final Pos
-            # pos = ""
-            if "get_current_position" in handlers:
-                pos = handlers["get_current_position"](whale_id)
-            else:
-                pos = "AUTO_POS_END"
+        def on_save_whale(whale_id):
+            # 0) un Save que ya espera sus posiciones no se repite
+            if whale_id in save_pending:
+                return
 
-            final_time = time.strftime("%H:%M:%S", time.localtime())
+            # debe existir start
+            t0 = start_times.get(whale_id, None)
+            if t0 is None:
+                messagebox.showwarning("Sin inicio", f"Primero presiona 'Start' para la ballena {whale_id}.")
+                return
 
-            # >>> guardar el ÚLTIMO STOP (freeze)
-            stop_snapshot[whale_id] = {"elapsed": elapsed, "final_time": final_time, "final_pos": pos}
+            # 1) si NUNCA dieron stop, crear stop "por defecto" UNA sola vez (freeze)
+            #    (y sí: llenamos los campos para que lo que guardes sea coherente con GUI;
+            #    si Save "define" que se fue, arranca el contador de "se fue hace…")
+            if stop_snapshot.get(whale_id) is None:
+                record_stop(whale_id, t0)
 
-            widget_final = row[IDX_FINAL_POS]
-            if isinstance(widget_final, tk.StringVar):
-                widget_final.set(pos)
-            else:
-                widget_final.delete(0, "end")
-                widget_final.insert(0, pos)
+            # 2) guardar cuando lleguen las posiciones pendientes (sin recalcular tiempos);
+            #    hasta que el INSERT termine, Save y Start de esta ballena no hacen nada
+            save_pending.add(whale_id)
 
-            # 2) Time (duración)
-            time_str = format_elapsed(elapsed)
-            widget_time = row[IDX_TIME]
-            if isinstance(widget_time, tk.StringVar):
-                widget_time.set(time_str)
-            else:
-                widget_time.delete(0, "end")
-                widget_time.insert(0, time_str)
+            def save():
+                data = get_form_data(get_whale_row(whale_id), columns)
 
-            # 3) Escribir la hora de finalización (Final Time)
-            final_time = time.strftime("%H:%M:%S", time.localtime())  # Hora de finalización
-            widget_final_time = row[IDX_FINAL_TIME]  # Asumimos que IDX_FINAL_TIME es el índice correcto para Final Time
+                if "save_whale" not in handlers:
+                    reset_whale(whale_id)
+                    return
 
-            if isinstance(widget_final_time, tk.StringVar):
-                widget_final_time.set(final_time)
-            else:
-                widget_final_time.delete(0, "end")
-                widget_final_time.insert(0, final_time)
+                # True = validado y encolado: el timer se apaga recién en
+                # reset_whale, cuando el hilo de BD confirma el INSERT
+                if not handlers["save_whale"](whale_id, data):
+                    save_pending.discard(whale_id)   # no pasó la validación
 
-            start_gone_counter(whale_id)
+            when_positions_ready(whale_id, save)
 
         # ------------- lógica para llevar el estado del tracking ---------#
         def set_status_available(whale_id):
             lbl = status_labels[whale_id]
             lbl.config(text="Available", bg="green", fg="white")
 
+        # main confirma el INSERT: apagar timer definitivo
+        def reset_whale(whale_id):
+            save_pending.discard(whale_id)
+            start_times[whale_id] = None
+            stop_snapshot[whale_id] = None
+
+        # si el INSERT falló, se conserva el avistamiento para volver a guardarlo
+        def save_failed(whale_id):
+            save_pending.discard(whale_id)
+
         # se espera confirmacion del main de datos correctos para cambiar el estado a available
         handlers["status_available"] = set_status_available
+        handlers["reset_whale"] = reset_whale
+        handlers["save_failed"] = save_failed
         ###------------------------SECCIÓN 1 - TITULOS Y BOTONES DE STATUS Y TRACKING---------------------###
         # Crear un canvas para dibujar la línea
         canvas = tk.Canvas(outer_frame, width=1200, height=650, bg="white")
@@ -451,8 +570,9 @@ class TrackingScreen(tk.Frame):
         # Estado del tracking general
         self.general_tracking_active = False
         self.general_tracking_job = None   # id del after()
-        self.general_route_file = None     # ruta del CSV
-        self.general_interval_min = 5      # valor por defecto (n minutos)
+        self.general_route_id = None       # route_id en la tabla route_points
+        self.general_interval_sec = 300    # valor por defecto (n segundos)
+        self.route_logger = None           # RouteLogger mientras está activo
 
         # diccionario para llevar el estado del tracking
         status_labels = {
@@ -811,64 +931,7 @@ class TrackingScreen(tk.Frame):
         whale_row_A = create_whale_form(form_frame_A, "A", 0)
 
         def on_save_whale_a():
-            whale_id = "A"
-
-            # 0) debe existir start
-            t0 = start_times.get(whale_id, None)
-            if t0 is None:
-                messagebox.showwarning("Sin inicio", f"Primero presiona 'Start' para la ballena {whale_id}.")
-                return
-
-            # 1) si NUNCA dieron stop, crear stop "por defecto" UNA sola vez (freeze)
-            if stop_snapshot.get(whale_id) is None:
-                elapsed = time.time() - t0
-
-                if "get_current_position" in handlers:
-                    pos = handlers["get_current_position"](whale_id)
-                else:
-                    pos = "AUTO_POS_END"
-
-                final_time = time.strftime("%H:%M:%S", time.localtime())
-                stop_snapshot[whale_id] = {"elapsed": elapsed, "final_time": final_time, "final_pos": pos}
-
-                # y sí: llenamos los campos (para que lo que guardes sea coherente con GUI)
-                row = get_whale_row(whale_id)
-
-                widget_final = row[IDX_FINAL_POS]
-                if isinstance(widget_final, tk.StringVar):
-                    widget_final.set(pos)
-                else:
-                    widget_final.delete(0, "end")
-                    widget_final.insert(0, pos)
-
-                time_str = format_elapsed(elapsed)
-                widget_time = row[IDX_TIME]
-                if isinstance(widget_time, tk.StringVar):
-                    widget_time.set(time_str)
-                else:
-                    widget_time.delete(0, "end")
-                    widget_time.insert(0, time_str)
-
-                widget_final_time = row[IDX_FINAL_TIME]
-                if isinstance(widget_final_time, tk.StringVar):
-                    widget_final_time.set(final_time)
-                else:
-                    widget_final_time.delete(0, "end")
-                    widget_final_time.insert(0, final_time)
-
-                # >>> CLAVE: si Save “define” que se fue, arrancar contador de “se fue hace…”
-                start_gone_counter(whale_id)
-            # 2) ahora sí, guardar (sin recalcular tiempos)
-            data = get_form_data(whale_row_A, columns)
-
-            ok = True
-            if "save_whale" in handlers:
-                ok = handlers["save_whale"](whale_id, data)  # debe devolver True/False
-
-            # 3) si guardó bien, apagar timer definitivo
-            if ok:
-                start_times[whale_id] = None
-                stop_snapshot[whale_id] = None
+            on_save_whale("A")
 
         save_button_whale_a = tk.Button(outer_frame, text="Save Whale A", font=("Arial", 10), bg="#2563EB", fg="white", command=on_save_whale_a)
         save_button_whale_a.place(x=1024, y=105, width=105, height=15)
@@ -901,65 +964,7 @@ class TrackingScreen(tk.Frame):
         whale_row_B = create_whale_form(form_frame_B, "B", 0)
 
         def on_save_whale_b():
-            whale_id = "B"
-
-            # 0) debe existir start
-            t0 = start_times.get(whale_id, None)
-            if t0 is None:
-                messagebox.showwarning("Sin inicio", f"Primero presiona 'Start' para la ballena {whale_id}.")
-                return
-
-            # 1) si NUNCA dieron stop, crear stop "por defecto" UNA sola vez (freeze)
-            if stop_snapshot.get(whale_id) is None:
-                elapsed = time.time() - t0
-
-                if "get_current_position" in handlers:
-                    pos = handlers["get_current_position"](whale_id)
-                else:
-                    pos = "AUTO_POS_END"
-
-                final_time = time.strftime("%H:%M:%S", time.localtime())
-                stop_snapshot[whale_id] = {"elapsed": elapsed, "final_time": final_time, "final_pos": pos}
-
-                # y sí: llenamos los campos (para que lo que guardes sea coherente con GUI)
-                row = get_whale_row(whale_id)
-
-                widget_final = row[IDX_FINAL_POS]
-                if isinstance(widget_final, tk.StringVar):
-                    widget_final.set(pos)
-                else:
-                    widget_final.delete(0, "end")
-                    widget_final.insert(0, pos)
-
-                time_str = format_elapsed(elapsed)
-                widget_time = row[IDX_TIME]
-                if isinstance(widget_time, tk.StringVar):
-                    widget_time.set(time_str)
-                else:
-                    widget_time.delete(0, "end")
-                    widget_time.insert(0, time_str)
-
-                widget_final_time = row[IDX_FINAL_TIME]
-                if isinstance(widget_final_time, tk.StringVar):
-                    widget_final_time.set(final_time)
-                else:
-                    widget_final_time.delete(0, "end")
-                    widget_final_time.insert(0, final_time)
-
-                # >>> CLAVE: si Save “define” que se fue, arrancar contador de “se fue hace…”
-                start_gone_counter(whale_id)
-
-            # 2) ahora sí, guardar (sin recalcular tiempos)
-            data = get_form_data(whale_row_B, columns)
-
-            ok = True
-            if "save_whale" in handlers:
-                ok = handlers["save_whale"](whale_id, data)  # debe devolver True/False
-
-            # 3) si guardó bien, apagar timer definitivo
-            if ok:
-                start_times[whale_id] = None
-                stop_snapshot[whale_id] = None
+            on_save_whale("B")
 
         save_button_whale_b = tk.Button(outer_frame, text="Save Whale B", font=("Arial", 10), bg="#2563EB", fg="white", command=on_save_whale_b)
         save_button_whale_b.place(x=1024, y=208, width=105, height=15)
@@ -991,65 +996,7 @@ class TrackingScreen(tk.Frame):
         whale_row_C = create_whale_form(form_frame_C, "C", 0)
 
         def on_save_whale_c():
-            whale_id = "C"
-
-            # 0) debe existir start
-            t0 = start_times.get(whale_id, None)
-            if t0 is None:
-                messagebox.showwarning("Sin inicio", f"Primero presiona 'Start' para la ballena {whale_id}.")
-                return
-
-            # 1) si NUNCA dieron stop, crear stop "por defecto" UNA sola vez (freeze)
-            if stop_snapshot.get(whale_id) is None:
-                elapsed = time.time() - t0
-
-                if "get_current_position" in handlers:
-                    pos = handlers["get_current_position"](whale_id)
-                else:
-                    pos = "AUTO_POS_END"
-
-                final_time = time.strftime("%H:%M:%S", time.localtime())
-                stop_snapshot[whale_id] = {"elapsed": elapsed, "final_time": final_time, "final_pos": pos}
-
-                # y sí: llenamos los campos (para que lo que guardes sea coherente con GUI)
-                row = get_whale_row(whale_id)
-
-                widget_final = row[IDX_FINAL_POS]
-                if isinstance(widget_final, tk.StringVar):
-                    widget_final.set(pos)
-                else:
-                    widget_final.delete(0, "end")
-                    widget_final.insert(0, pos)
-
-                time_str = format_elapsed(elapsed)
-                widget_time = row[IDX_TIME]
-                if isinstance(widget_time, tk.StringVar):
-                    widget_time.set(time_str)
-                else:
-                    widget_time.delete(0, "end")
-                    widget_time.insert(0, time_str)
-
-                widget_final_time = row[IDX_FINAL_TIME]
-                if isinstance(widget_final_time, tk.StringVar):
-                    widget_final_time.set(final_time)
-                else:
-                    widget_final_time.delete(0, "end")
-                    widget_final_time.insert(0, final_time)
-
-                # >>> CLAVE: si Save “define” que se fue, arrancar contador de “se fue hace…”
-                start_gone_counter(whale_id)
-                
-            # 2) ahora sí, guardar (sin recalcular tiempos)
-            data = get_form_data(whale_row_C, columns)
-
-            ok = True
-            if "save_whale" in handlers:
-                ok = handlers["save_whale"](whale_id, data)  # debe devolver True/False
-
-            # 3) si guardó bien, apagar timer definitivo
-            if ok:
-                start_times[whale_id] = None
-                stop_snapshot[whale_id] = None
+            on_save_whale("C")
 
         save_button_whale_c = tk.Button(outer_frame, text="Save Whale C", font=("Arial", 10), bg="#2563EB", fg="white", command=on_save_whale_c)
         save_button_whale_c.place(x=1024, y=313, width=110, height=15)
@@ -1168,25 +1115,27 @@ class TrackingScreen(tk.Frame):
         item_to_dbid = {}  
         def load_last_5_records():
             """Carga los últimos 5 registros desde la BD usando el handler."""
-            # limpiar tabla
-            for item in tree.get_children():
-                tree.delete(item)
-            item_to_dbid.clear()
-
             # pedir datos a main.py
             if "fetch_last_records" not in handlers:
                 return  # por seguridad
 
-            records = handlers["fetch_last_records"]()
+            def fill(records):
+                # limpiar tabla
+                for item in tree.get_children():
+                    tree.delete(item)
+                item_to_dbid.clear()
 
-            for rec in records:
-                db_id = rec.get("_db_id")  # id real de BD (1,2,3,...)
-                values = [rec.get(col, "") for col in columns]
+                for rec in records:
+                    db_id = rec.get("_db_id")  # id real de BD (1,2,3,...)
+                    values = [rec.get(col, "") for col in columns]
 
-                item = tree.insert("", "end", values=values)
+                    item = tree.insert("", "end", values=values)
 
-                if db_id is not None:
-                    item_to_dbid[item] = db_id
+                    if db_id is not None:
+                        item_to_dbid[item] = db_id
+
+            # la consulta corre en el hilo de BD; fill() se llama al terminar
+            run_db(handlers, handlers["fetch_last_records"], on_done=fill)
 
         # Estilo
         style = ttk.Style()
@@ -1273,7 +1222,12 @@ class TrackingScreen(tk.Frame):
                 # aquí es donde usamos el id REAL de la BD
                 db_id = item_to_dbid.get(row_id)
                 if db_id is not None and "update_record_field" in handlers:
-                    handlers["update_record_field"](db_id, field_name, new_value)
+                    run_db(
+                        handlers, handlers["update_record_field"], db_id, field_name, new_value,
+                        on_error=lambda e: messagebox.showerror(
+                            "Error", f"No se pudo guardar el cambio:\n{e}"
+                        )
+                    )
 
                 edit_entry.destroy()
 
@@ -1300,81 +1254,81 @@ class TrackingScreen(tk.Frame):
             messagebox.showerror("Error", "No hay handler para obtener posición GPS.")
             return
 
-        # Preguntar cada cuántos minutos quieres registrar
+        # Preguntar cada cuántos segundos quieres registrar
         n = simpledialog.askinteger(
             "Intervalo de registro",
-            "¿Cada cuántos minutos quieres guardar la posición?",
-            initialvalue=self.general_interval_min,
+            "¿Cada cuántos segundos quieres guardar la posición?",
+            initialvalue=self.general_interval_sec,
             minvalue=1,
             parent=self,
         )
         if n is None:
             return  # canceló
 
-        self.general_interval_min = n
-        interval_ms = n * 60 * 1000
+        self.general_interval_sec = n
 
-        # Usa una carpeta fija de prueba:
-        folder = os.getcwd()
+        if "save_route_points" not in self.handlers:
+            messagebox.showerror("Error", "No hay handler para guardar la ruta.")
+            return
 
-        # Crear nombre de archivo con timestamp
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        filename = f"general_route_{timestamp}.csv"
-        self.general_route_file = os.path.join(folder, filename)
+        # Identificador de la ruta con timestamp (tabla route_points)
+        self.general_route_started = datetime.now()
+        timestamp = self.general_route_started.strftime("%Y-%m-%d_%H-%M-%S")
+        route_id = f"general_route_{timestamp}"
+        self.general_route_id = route_id
+
+        # Cada punto se guarda en la BD apenas llega, desde el hilo del logger,
+        # simplificado según gps_config.json (y opcionalmente también crudo)
+        save_points = self.handlers["save_route_points"]
+        cfg = gps.load_config()
+        simplifier = None
+        if float(cfg.get("route_tolerance_m", 0)) > 0:
+            simplifier = TrackSimplifier(
+                tolerance_m=float(cfg["route_tolerance_m"]),
+                min_distance_m=float(cfg.get("route_min_distance_m", 0)),
+                max_interval_sec=float(cfg.get("route_max_interval_sec", 60)),
+            )
+        raw_sink = None
+        if cfg.get("route_keep_raw"):
+            raw_sink = lambda points: save_points(route_id, points, raw=True)
 
-        # Escribir encabezado
-        try:
-            with open(self.general_route_file, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["fecha", "hora", "latitud", "longitud"])  # Nuevo encabezado
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo crear el archivo:\n{e}")
-            self.general_route_file = None
-            return
+        self.route_logger = RouteLogger(
+            sink=lambda points: save_points(route_id, points),
+            simplifier=simplifier,
+            raw_sink=raw_sink,
+        ).open()
 
         # Marcar como activo y cambiar colores
         self.general_tracking_active = True
         self.start_button_general_tracking.config(bg="#16A34A")  # verde
         self.stop_button_general_tracking.config(bg="#DC2626")   # rojo
 
-        # Guardar intervalo y lanzar primera captura
-        self.general_interval_ms = interval_ms
-        self._capture_general_point()  # primera captura inmediata
-
-    def _capture_general_point(self):
-        """Captura una posición y programa la siguiente captura."""
-        if not self.general_tracking_active:
-            return
-        if not self.general_route_file:
+        # Las lecturas corren en el hilo del logger; la GUI solo vigila errores
+        self.route_logger.start(self._read_general_position, n)
+        self._check_general_route()
+
+    def _read_general_position(self):
+        """Posición para la ruta general (hilo del logger): (lat, lon) o None sin fix."""
+        # no ligada a A o B, así que paso None
+        pos = self.handlers["get_current_position"](None)
+        if pos == "GPS_ERROR":
+            return None
+        lat, lon = pos.split(",")
+        return float(lat), float(lon)
+
+    def _check_general_route(self):
+        """Revisa cada segundo si el logger se detuvo por un error de escritura."""
+        if not self.general_tracking_active or self.route_logger is None:
             return
 
-        # Obtener posición del handler (no ligada a A o B, así que paso None)
-        try:
-            pos = self.handlers["get_current_position"](None)
-        except Exception as e:
-            print("Error obteniendo posición GPS:", e)
-            pos = "GPS_ERROR"
-
-        # Timestamp actual
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # Formato: "YYYY-MM-DD HH:MM:SS"
-        date, time = ts.split(" ")  # Dividir la fecha y la hora
-
-        # Separar latitud y longitud (asumimos que `pos` es "latitud,longitud")
-        lat, lon = pos.split(",") if pos != "GPS_ERROR" else ("0.0", "0.0")
-
-        # Guardar en el CSV
-        try:
-            with open(self.general_route_file, "a", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow([date, time, lat, lon])  # Guardar en columnas separadas
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo escribir en el archivo de tracking:\n{e}")
+        if self.route_logger.error is not None:
+            error = self.route_logger.error
+            messagebox.showerror("Error", f"No se pudo guardar la ruta general:\n{error}")
             # si falla, mejor detener el tracking
             self.stop_general_tracking(show_message=False)
             return
 
-        # Programar siguiente captura
-        self.general_tracking_job = self.after(self.general_interval_ms, self._capture_general_point)
+        self.general_tracking_job = self.after(1000, self._check_general_route)
 
     def stop_general_tracking(self, show_message=True):
         if not self.general_tracking_active:
@@ -1392,15 +1346,33 @@ class TrackingScreen(tk.Frame):
                 pass
             self.general_tracking_job = None
 
+        # Detener el hilo y guardar lo pendiente
+        points = 0
+        if self.route_logger is not None:
+            try:
+                self.route_logger.close()
+            except Exception as e:
+                print("Error guardando los últimos puntos de la ruta:", e)
+            points = self.route_logger.points_written
+            self.route_logger = None
+
+        # Con la ruta ya guardada, calcular distancias y velocidades de los
+        # avistamientos de esos días (en el hilo de BD)
+        if points and "fill_derived_columns" in self.handlers:
+            run_db(self.handlers, self.handlers["fill_derived_columns"],
+                   self.general_route_started.strftime("%Y-%m-%d"),
+                   datetime.now().strftime("%Y-%m-%d"))
+
         # Reset colores de botones
         self.start_button_general_tracking.config(bg="black")
         self.stop_button_general_tracking.config(bg="black")
 
-        # Avisar dónde quedó el archivo
-        if show_message and self.general_route_file:
+        # Avisar cómo quedó guardada la ruta
+        if show_message and self.general_route_id:
             messagebox.showinfo(
                 "Tracking general finalizado",
-                f"Se guardó el tracking general en:\n{self.general_route_file}"
+                f"Se guardó el tracking general en la base de datos:\n"
+                f"{self.general_route_id} ({points} puntos)"
             )
 
 class LogsScreen(tk.Frame):
@@ -1457,6 +1429,10 @@ class LogsScreen(tk.Frame):
         self.entry_to = tk.Entry(filter_frame, width=12)
         self.entry_to.grid(row=0, column=3, padx=5, pady=5)
 
+        # cuántos registros hay en la vista actual
+        self.rows_label = tk.Label(filter_frame, text="", bg=BG, fg=TEXT, font=("Arial", 10))
+        self.rows_label.grid(row=0, column=6, padx=10, pady=5)
+
         # Paleta de colores para botones
         COLORS = {
             "primary": "#2563EB",     # Filter, Export
@@ -1488,15 +1464,32 @@ class LogsScreen(tk.Frame):
         )
         clear_btn.grid(row=0, column=5, padx=10, pady=5)
 
-        export_btn = tk.Button(
+        # formato de exportación (Parquet / Arrow solo si pyarrow está instalado)
+        formats = ["csv"]
+        if "export_formats" in self.handlers:
+            formats = self.handlers["export_formats"]()
+        self.export_format_var = tk.StringVar(value=formats[0])
+        export_format = ttk.Combobox(
             actions_frame,
-            text="Export CSV",
+            textvariable=self.export_format_var,
+            values=formats,
+            state="readonly",
+            width=8,
+        )
+        export_format.grid(row=0, column=5, padx=(10, 0), pady=5)
+
+        # Export / Cancel export (mientras hay una exportación en segundo plano)
+        self.export_btn = tk.Button(
+            actions_frame,
+            text="Export",
             font=("Arial", 10),
             bg=COLORS["primary"],
             fg="white",
-            command=self.export_csv         
+            command=self.export_csv
         )
-        export_btn.grid(row=0, column=6, padx=10, pady=5)
+        self.export_btn.grid(row=0, column=6, padx=10, pady=5)
+        self._export_job = None
+        self._export_poll_job = None
 
         delete_btn = tk.Button(
             actions_frame,
@@ -1518,7 +1511,7 @@ class LogsScreen(tk.Frame):
         )
         refresh_btn.grid(row=0, column=8, padx=10, pady=5)
 
-        backup_btn = tk.Button(
+        self.backup_btn = tk.Button(
             actions_frame,
             text="Backup DB",
             font=("Arial", 10),
@@ -1526,7 +1519,8 @@ class LogsScreen(tk.Frame):
             fg="white",
             command=self.backup_db
         )
-        backup_btn.grid(row=0, column=9, padx=10, pady=5)
+        self.backup_btn.grid(row=0, column=9, padx=10, pady=5)
+        self._backup_job = None
 
         back_btn = tk.Button(
             actions_frame,
@@ -1538,6 +1532,10 @@ class LogsScreen(tk.Frame):
         )
         back_btn.grid(row=0, column=10, padx=10, pady=5)
 
+        # progreso de la exportación en curso (filas, %, filas/s)
+        self.export_status_label = tk.Label(actions_frame, text="", bg=BG, fg=TEXT, font=("Arial", 10))
+        self.export_status_label.grid(row=0, column=11, padx=10, pady=5)
+
         # ---------- Tabla para ver registros ----------
         table_frame = tk.Frame(self, bg=BG)
         table_frame.pack(pady=30, padx=40, fill="both", expand=True)
@@ -1574,7 +1572,9 @@ class LogsScreen(tk.Frame):
         self.tree.configure(xscrollcommand=scroll_x.set)
 
         scroll_y = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scroll_y.set)
+        self.scroll_y = scroll_y
+        # además de mover la barra, pide más páginas al acercarse a los bordes
+        self.tree.configure(yscrollcommand=self._on_tree_yscroll)
         # ----------------------
         # Layout usando GRID
         # ----------------------
@@ -1587,10 +1587,23 @@ class LogsScreen(tk.Frame):
         table_frame.grid_rowconfigure(0, weight=1)
         table_frame.grid_columnconfigure(0, weight=1)
 
-        # donde guardamos los registros actuales (para exportar a CSV)
-        self.current_records = []
-
-        # opcional: cargar algo inicial (últimos 20)
+        # filtro de fechas actual (start, end) en YYYY-MM-DD, o None si se
+        # muestran los últimos registros; export_csv vuelve a leerlo de la BD
+        self.current_filter = None
+        # after() que va llenando la tabla por tandas
+        self._fill_job = None
+
+        # Tabla paginada (vista filtrada): solo hay unas pocas páginas en el
+        # Treeview; item -> (created_at, id) para pedir la página vecina
+        self.item_to_key = {}
+        self._paged = False
+        self._more_before = False
+        self._more_after = False
+        self._loading_page = False
+        self._total_rows = 0
+        self._view_token = 0
+
+        # opcional: cargar algo inicial (últimos RECENT_LOGS_LIMIT)
         self.load_logs()
 
     # --------- Lógica de filtros ---------
@@ -1639,23 +1652,218 @@ class LogsScreen(tk.Frame):
             messagebox.showerror("Error", "No hay handler para filtrar por fecha.")
             return
 
-        records = self.handlers["fetch_records_by_date"](start_date_str, end_date_str)
-        self.current_records = records  # guardamos para exportar
+        self.current_filter = (start_date_str, end_date_str)  # guardamos para exportar
 
-        # limpiar tabla
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        if "fetch_records_page" in self.handlers:
+            self._open_paged_view()
+        else:
+            run_db(
+                self.handlers, self.handlers["fetch_records_by_date"],
+                start_date_str, end_date_str,
+                on_done=self._fill_tree
+            )
+
+    # Filas que se insertan en el Treeview por cada vuelta del loop de Tk
+    FILL_BATCH = 200
+
+    def _fill_tree(self, records):
+        """
+        Limpia la tabla y la llena con `records` (lista o generador) por tandas,
+        usando after() para que Tk siga respondiendo con rangos grandes.
+        """
+        self._clear_tree()
+        self._paged = False
+
+        records = iter(records)
+
+        def fill_step():
+            count = 0
+            for rec in itertools.islice(records, self.FILL_BATCH):
+                values = [rec.get(col, "") for col in self.columns]
+                item_id = self.tree.insert("", "end", values=values)
+
+                # guardar id de BD
+                db_id = rec.get("_db_id")
+                if db_id is not None:
+                    self.item_to_dbid[item_id] = db_id
+                count += 1
+
+            self._total_rows += count
+            if count == self.FILL_BATCH:
+                self._fill_job = self.after(1, fill_step)
+            else:
+                self._fill_job = None
+                self.rows_label.config(text=f"{self._total_rows} registros")
+
+        fill_step()
+
+    def _clear_tree(self):
+        """Vacía el Treeview y sus mapeos, cancelando cualquier llenado pendiente."""
+        if self._fill_job is not None:
+            self.after_cancel(self._fill_job)
+            self._fill_job = None
+
+        self.tree.delete(*self.tree.get_children())
         self.item_to_dbid.clear()
+        self.item_to_key.clear()
+        self._total_rows = 0
+        # invalida respuestas de páginas pedidas para la vista anterior
+        self._view_token += 1
+        self._loading_page = False
+
+    # --------- Tabla paginada (scroll virtual) ---------
+
+    # Filas por página pedidas a la BD (el mismo límite que usa get_records_page)
+    PAGE_SIZE = database.PAGE_SIZE
+    # Páginas que se mantienen en el Treeview (lo visible + un buffer)
+    WINDOW_PAGES = 3
+    # Fracción del scroll cerca de un borde que dispara la carga de otra página
+    PAGE_TRIGGER = 0.1
+
+    def _open_paged_view(self):
+        """Muestra el rango filtrado cargando solo la primera página."""
+        self._clear_tree()
+        self._paged = True
+        self._more_before = False
+        self._more_after = True
+
+        start_date, end_date = self.current_filter
+        if "count_records" in self.handlers:
+            token = self._view_token
+
+            def show_count(total):
+                if token != self._view_token:
+                    return
+                self._total_rows = total
+                self.rows_label.config(text=f"{total} registros")
+
+            run_db(self.handlers, self.handlers["count_records"], start_date, end_date,
+                   on_done=show_count)
+
+        self._loading_page = True
+        self._load_page_after()
+
+    def _insert_record(self, rec, index="end"):
+        values = [rec.get(col, "") for col in self.columns]
+        item_id = self.tree.insert("", index, values=values)
+
+        # guardar id de BD y clave de orden (para pedir la página vecina)
+        db_id = rec.get("_db_id")
+        if db_id is not None:
+            self.item_to_dbid[item_id] = db_id
+            self.item_to_key[item_id] = (rec.get("Date"), db_id)
+        return item_id
+
+    def _fetch_page(self, on_page, **key):
+        """Pide una página en el hilo de BD; on_page(page) solo se llama si la vista no cambió."""
+        start_date, end_date = self.current_filter
+        token = self._view_token
+
+        def done(page):
+            if token != self._view_token:
+                return  # el usuario ya filtró otra cosa
+            try:
+                on_page(page)
+            finally:
+                self._loading_page = False
+
+        def failed(e):
+            if token == self._view_token:
+                self._loading_page = False
+            messagebox.showerror("Error", f"No se pudieron cargar los registros:\n{e}")
+
+        run_db(
+            self.handlers, self.handlers["fetch_records_page"],
+            start_date, end_date, limit=self.PAGE_SIZE,
+            on_done=done, on_error=failed, **key
+        )
 
-        # rellenar
-        for rec in records:
-            values = [rec.get(col, "") for col in self.columns]
-            item_id = self.tree.insert("", "end", values=values)
+    def _load_page_after(self):
+        items = self.tree.get_children()
+        after = self.item_to_key.get(items[-1]) if items else None
 
-            # guardar id de BD
-            db_id = rec.get("_db_id")
-            if db_id is not None:
-                self.item_to_dbid[item_id] = db_id
+        def on_page(page):
+            self._more_after = len(page) == self.PAGE_SIZE
+            for rec in page:
+                self._insert_record(rec)
+            self._trim_window(keep_end=True)
+
+        self._fetch_page(on_page, after=after)
+
+    def _load_page_before(self):
+        items = self.tree.get_children()
+        if not items:
+            self._loading_page = False
+            return
+        before = self.item_to_key.get(items[0])
+
+        def on_page(page):
+            self._more_before = len(page) == self.PAGE_SIZE
+            if not page:
+                return
+
+            anchor = self._top_visible_item()
+            for index, rec in enumerate(page):
+                self._insert_record(rec, index)
+
+            self._trim_window(keep_end=False)
+            self._scroll_to_anchor(anchor)
+
+        self._fetch_page(on_page, before=before)
+
+    def _trim_window(self, keep_end):
+        """
+        Si hay más de WINDOW_PAGES páginas, borra las filas del lado contrario
+        al que se está leyendo (keep_end=True borra arriba, False borra abajo).
+        """
+        items = self.tree.get_children()
+        excess = len(items) - self.WINDOW_PAGES * self.PAGE_SIZE
+        if excess <= 0:
+            return
+
+        anchor = self._top_visible_item()
+        if keep_end:
+            to_delete = items[:excess]
+            self._more_before = True
+        else:
+            to_delete = items[-excess:]
+            self._more_after = True
+
+        self.tree.delete(*to_delete)
+        for item in to_delete:
+            self.item_to_dbid.pop(item, None)
+            self.item_to_key.pop(item, None)
+
+        if keep_end:
+            self._scroll_to_anchor(anchor)
+
+    def _top_visible_item(self):
+        items = self.tree.get_children()
+        if not items:
+            return None
+        top = int(self.tree.yview()[0] * len(items))
+        return items[min(top, len(items) - 1)]
+
+    def _scroll_to_anchor(self, anchor):
+        """Deja `anchor` arriba de la vista, para que agregar/quitar filas no haga saltar el scroll."""
+        items = self.tree.get_children()
+        if anchor is None or not items or not self.tree.exists(anchor):
+            return
+        self.tree.yview_moveto(self.tree.index(anchor) / len(items))
+
+    def _on_tree_yscroll(self, first, last):
+        self.scroll_y.set(first, last)
+        if not self._paged or self._loading_page:
+            return
+
+        # _loading_page se libera cuando llega la página (ver _fetch_page)
+        first, last = float(first), float(last)
+        if last >= 1.0 - self.PAGE_TRIGGER and self._more_after:
+            self._loading_page = True
+            self.after_idle(self._load_page_after)
+        elif first <= self.PAGE_TRIGGER and self._more_before:
+            self._loading_page = True
+            self.after_idle(self._load_page_before)
 
     def clear_filters(self):
         """Limpia las cajas de fecha y recarga el log inicial (últimos registros)."""
@@ -1713,45 +1921,35 @@ class LogsScreen(tk.Frame):
             )
             return
 
-        # borrar en la BD
-        try:
-            self.handlers["delete_records"](db_ids)
-        except Exception as e:
-            messagebox.showerror("Error al borrar", f"No se pudieron borrar los registros:\n{e}")
-            return
+        def on_deleted(_result):
+            # borrar del Treeview y de estructuras locales
+            for item in selected_items:
+                if self.tree.exists(item):
+                    self.tree.delete(item)
+                self.item_to_dbid.pop(item, None)
+                self.item_to_key.pop(item, None)
 
-        # borrar del Treeview y de estructuras locales
-        for item in selected_items:
-            self.tree.delete(item)
-            self.item_to_dbid.pop(item, None)
+            self._total_rows = max(0, self._total_rows - len(db_ids))
+            self.rows_label.config(text=f"{self._total_rows} registros")
 
-        # actualizar self.current_records filtrando los que borramos
-        self.current_records = [
-            r for r in self.current_records
-            if r.get("_db_id") not in db_ids
-        ]
+            messagebox.showinfo("Borrado", "Registros borrados correctamente.")
 
-        messagebox.showinfo("Borrado", "Registros borrados correctamente.")
+        def on_delete_error(e):
+            messagebox.showerror("Error al borrar", f"No se pudieron borrar los registros:\n{e}")
+
+        # borrar en la BD (en el hilo de BD)
+        run_db(
+            self.handlers, self.handlers["delete_records"], db_ids,
+            on_done=on_deleted, on_error=on_delete_error
+        )
 
 
-    # --------- Exportar CSV ---------
+    # --------- Exportar (CSV / Parquet / Arrow) ---------
     def export_csv(self):
-        if not self.current_records:
+        if not self.tree.get_children():
             messagebox.showinfo("Sin datos", "No hay registros para exportar.")
             return
 
-        # separar registros por ID (A y B)
-        records_A = [rec for rec in self.current_records if rec.get("ID") == "A"]
-        records_B = [rec for rec in self.current_records if rec.get("ID") == "B"]
-        records_C = [rec for rec in self.current_records if rec.get("ID") == "C"]
-
-        if not records_A and not records_B and not records_C:
-            messagebox.showinfo(
-                "Sin datos",
-                "No hay registros con ID 'A', 'B' ni 'C' en el filtro actual."
-            )
-            return
-
         # -----------------------------
         # Construir sufijo de fecha/rango
         # -----------------------------
@@ -1798,145 +1996,112 @@ class LogsScreen(tk.Frame):
             )
             return
 
-        errors = []
+        # exportar A, B y C en una sola pasada, leyendo en streaming desde la BD,
+        # en el formato elegido (csv, csv.gz, csv.zst, parquet, arrow)
+        # (la vista actual: el filtro de fechas, o los últimos RECENT_LOGS_LIMIT sin filtro).
+        # Corre en segundo plano; el botón pasa a "Cancel export".
+        if self.current_filter:
+            start_date, end_date = self.current_filter
+            last = None
+        else:
+            start_date = end_date = None
+            last = RECENT_LOGS_LIMIT
 
-        # función interna para escribir un archivo
-        def write_csv(path, records):
-            with open(path, mode="w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
+        try:
+            self._export_job = self.handlers["start_export"](
+                folder, start_date=start_date, end_date=end_date, last=last,
+                suffix=date_suffix, fmt=self.export_format_var.get()
+            )
+        except Exception as e:
+            messagebox.showerror("Error al exportar", f"No se pudo iniciar la exportación:\n{e}")
+            return
 
-                # Escribir los encabezados
-                # Nuevos encabezados con columnas separadas para fecha, hora, latitud y longitud
-                writer.writerow([
-                    "fecha", "# Sightings", "hora", "ID",  "M-C", "Init Latitude","Init Longitude", "Init Time", "Final Latitude", "Final Longitude","Final Time",
-                    "Surface Time", "Behavior", "# Blows", "Blow Sample", "First Blow", "# Whales",
-                    "Individual (letter)", "Initial Distance", "Angle", "# Photos", "Photo Drone", "Fluke", "Shallow dive",
-                    "# Skin Sample", "Feces", "# Feces", "# Boats", "Boat Speed", "WW-Whale Distance", "Engine On",
-                    "# Visibility", "Hydrophone", "Observations"
-                ])
+        self.export_btn.config(text="Cancel export", command=self.cancel_export)
+        self.export_status_label.config(text="Exporting...")
+        self._poll_export()
+
+    def cancel_export(self, wait=False):
+        """
+        Cancela la exportación en curso (los archivos temporales se borran).
+        wait=True espera a que el hilo termine (al cerrar la app).
+        """
+        job = self._export_job
+        if job is not None and not job.done:
+            job.cancel()
+            self.export_status_label.config(text="Cancelling...")
+            if wait:
+                job.join(timeout=5)
+
+    def _poll_export(self):
+        """Actualiza el progreso cada 200 ms y muestra el resultado al terminar."""
+        job = self._export_job
+        if job is None:
+            return
 
-                for rec in records:
-                    # Separar los valores de fecha y hora
-                    timestamp = rec.get("Date", "")
-                    date, time = timestamp.split(" ") if timestamp else ("", "")
-                    
-                    # Separar latitud y longitud
-                    init_pos = rec.get("Init Pos", "")
-                    lat_init, lon_init = init_pos.split(",") if init_pos else ("", "")
-
-                    # Separar latitud y longitud de Final Pos (latitud, longitud)
-                    final_pos = rec.get("Final Pos", "")
-                    lat_final, lon_final = final_pos.split(",") if final_pos else ("", "")
-
-                    # Crear una fila con los nuevos valores separados
-                    row = [
-                        date,  # fecha
-                        rec.get("# Sightings", ""),
-                        time,  # hora
-                        rec.get("ID", ""),
-                        rec.get("M-C", ""),
-                        lat_init,  # latitud inicial
-                        lon_init,  # longitud inicial
-                        rec.get("Init Time", ""),
-                        lat_final, # latitud final
-                        lon_final, # longitud final
-                        rec.get("Final Time", ""),
-                        rec.get("Surface Time", ""),
-                        rec.get("Behavior", ""),
-                        rec.get("# Blows", ""),
-                        rec.get("Blow Sample", ""),
-                        rec.get("First Blow", ""),
-                        rec.get("# Whales", ""),
-                        rec.get("Individual (letter)", ""),
-                        rec.get("Initial Distance", ""),
-                        rec.get("Angle", ""),
-                        rec.get("# Photos", ""),
-                        rec.get("Photo Drone", ""),
-                        rec.get("Fluke", ""),
-                        rec.get("Shallow dive", ""),
-                        rec.get("# Skin Sample", ""),
-                        rec.get("Feces", ""),
-                        rec.get("# Feces", ""),
-                        rec.get("# Boats", ""),
-                        rec.get("Boat Speed", ""),
-                        rec.get("WW-Whale Distance", ""),
-                        rec.get("Engine On", ""),
-                        rec.get("# Visibility", ""),
-                        rec.get("Hydrophone", ""),
-                        rec.get("Observations", ""),
-                    ]
-                    writer.writerow(row)
-
-        # guardar A
-        path_A = None
-        if records_A:
-            filename_A = f"whale_A_logs{date_suffix}.csv"
-            path_A = os.path.join(folder, filename_A)
-            try:
-                write_csv(path_A, records_A)
-            except Exception as e:
-                errors.append(f"A: {e}")
+        if not job.done:
+            self.export_status_label.config(
+                text=f"Exporting: {job.percent:.0f}% · {job.rows_done:,} rows · {job.rows_per_sec:,.0f} rows/s"
+            )
+            self._export_poll_job = self.after(200, self._poll_export)
+            return
 
-        # guardar B
-        path_B = None
-        if records_B:
-            filename_B = f"whale_B_logs{date_suffix}.csv"
-            path_B = os.path.join(folder, filename_B)
-            try:
-                write_csv(path_B, records_B)
-            except Exception as e:
-                errors.append(f"B: {e}")
-        # Guardar C
-        path_C = None
-        if records_C:
-            filename_C = f"whale_C_logs{date_suffix}.csv"
-            path_C = os.path.join(folder, filename_C)
-            try:
-                write_csv(path_C, records_C)
-            except Exception as e:
-                errors.append(f"C: {e}")
+        self._export_job = None
+        self._export_poll_job = None
+        self.export_btn.config(text="Export", command=self.export_csv)
+        self.export_status_label.config(text="")
+        self._show_export_result(job)
 
-        if errors:
-            messagebox.showerror(
-                "Error al exportar",
-                "Ocurrieron errores al exportar:\n" + "\n".join(errors)
+    def _show_export_result(self, job):
+        if job.error is not None:
+            if job.cancelled:
+                messagebox.showinfo("Exportación cancelada", "Se canceló la exportación; no se guardó ningún archivo.")
+            else:
+                messagebox.showerror(
+                    "Error al exportar",
+                    f"Ocurrieron errores al exportar:\n{job.error}"
+                )
+            return
+
+        written = job.result or {}
+        if not written:
+            messagebox.showinfo(
+                "Sin datos",
+                "No hay registros con ID 'A', 'B' ni 'C' en el filtro actual."
             )
-        else:
-            msg = "Archivos exportados correctamente:\n"
-            if path_A:
-                msg += f"  - {path_A}\n"
-            if path_B:
-                msg += f"  - {path_B}\n"
-            if path_C:
-                msg += f"  - {path_C}\n"  
-            messagebox.showinfo("Exportación exitosa", msg)
+            return
+
+        msg = "Archivos exportados correctamente:\n"
+        for whale_id in ("A", "B", "C"):
+            if written.get(whale_id):
+                msg += f"  - {written[whale_id]}\n"
+        if job.coerced_cells:
+            msg += (
+                f"\n{job.coerced_cells:,} celdas no coincidían con el tipo de su "
+                "columna y quedaron vacías."
+            )
+        messagebox.showinfo("Exportación exitosa", msg)
 
     # ---------- Cargar algo al entrar, esto es para el log ----------
     def load_logs(self):
-        """Carga algunos registros iniciales (por ejemplo, los últimos 20)."""
+        """Carga los últimos RECENT_LOGS_LIMIT registros (vista sin filtro)."""
         if "fetch_last_records" not in self.handlers:
             return
 
-        records = self.handlers["fetch_last_records"](limit=20)
-        self.current_records = records
+        self.current_filter = None
+        run_db(self.handlers, self.handlers["fetch_last_records"], limit=RECENT_LOGS_LIMIT,
+               on_done=self._fill_tree)
 
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        self.item_to_dbid.clear()   # limpiar mapping inicial
-
-        for rec in records:
-            values = [rec.get(col, "") for col in self.columns]
-            item_id = self.tree.insert("", "end", values=values)
-
-            db_id = rec.get("_db_id")
-            if db_id is not None:
-                self.item_to_dbid[item_id] = db_id
+    @property
+    def backup_running(self):
+        return self._backup_job is not None and not self._backup_job.done
 
     def backup_db(self):
         """Pide una carpeta y crea un backup de la base de datos ahí."""
-        if "backup_db" not in self.handlers:
+        if "start_backup" not in self.handlers:
             messagebox.showerror("Error", "No hay handler para hacer backup de la base de datos.")
             return
+        if self.backup_running:
+            return
 
         # Obtener carpeta del ejecutable o del script
         try:
@@ -1949,18 +2114,37 @@ class LogsScreen(tk.Frame):
             messagebox.showerror("Error", f"No se pudo obtener carpeta del programa:\n{e}")
             return
 
+        # el backup corre en su propio hilo (no ocupa el hilo de BD)
         try:
-            backup_path = self.handlers["backup_db"](folder)
+            self._backup_job = self.handlers["start_backup"](folder)
         except Exception as e:
+            messagebox.showerror("Error al crear backup", f"No se pudo iniciar el backup:\n{e}")
+            return
+
+        self.backup_btn.config(state="disabled", text="Backing up...")
+        self._poll_backup()
+
+    def _poll_backup(self):
+        """Revisa cada 200 ms si terminó el backup y muestra el resultado."""
+        job = self._backup_job
+        if job is None:
+            return
+        if not job.done:
+            self.after(200, self._poll_backup)
+            return
+
+        self.backup_btn.config(state="normal", text="Backup DB")
+        if job.error is not None:
             messagebox.showerror(
                 "Error al crear backup",
-                f"No se pudo crear el backup de la base de datos:\n{e}"
+                f"No se pudo crear el backup de la base de datos:\n{job.error}"
             )
             return
-
         messagebox.showinfo(
             "Backup creado",
-            f"Backup creado correctamente en:\n{backup_path}"
+            f"Backup creado correctamente en:\n{job.result}\n\n"
+            "(el índice para backups diferenciales queda en la subcarpeta "
+            f"'{backup.SNAPSHOT_DIR}')"
         )
 
 class ConfigScreen(tk.Frame):
@@ -2067,12 +2251,12 @@ class ConfigScreen(tk.Frame):
             messagebox.showinfo(
                 "Test OK",
                 "Simulated GPS is active.\n"
-                "Switch off this option to test the real GNSS sensor."
+                "Switch off this option to test the configured GPS provider."
             )
             return
 
         try:
-            # test_connection ya ignora config, así que no le pasamos nada
+            # prueba el proveedor configurado (winrt / nmea / replay)
             lat, lon = gps.test_connection()
             messagebox.showinfo(
                 "GPS OK",
@@ -1,9 +1,16 @@
 from tkinter import messagebox
 import tkinter as tk
 from tkinter import ttk
+import queue
+import threading
+import time
 from gui import StartScreen, TrackingScreen, LogsScreen, ConfigScreen
 import database
 import gps
+from db_worker import DBWorker
+from tk_worker import TkWorker
+import exporter
+import backup
 
 handlers = {}  # diccionario global compartido con la GUI
 
@@ -98,6 +105,8 @@ def save_whale_handler(whale_id, data_gui):
     """
     whale_id: 'A', 'B' o 'C'
     data_gui: dict con claves de la GUI (las de `columns`)
+    Devuelve True si los datos son válidos y el INSERT quedó encolado; el
+    resultado llega después a handlers["reset_whale"] o handlers["save_failed"].
     """
 
     # Si el whale_id es 'C', no validar los datos
@@ -115,50 +124,48 @@ def save_whale_handler(whale_id, data_gui):
         cleaned_data = data_gui
         errors = []
 
-    # 1. Si todo está bien (o si es 'C', no se validó), convertir claves GUI -> columnas SQL
-    db_fields = []
-    db_values = []
-    for gui_key, value in cleaned_data.items():
-        if gui_key not in database.GUI_TO_DB:
-            continue
-        db_fields.append(database.GUI_TO_DB[gui_key])
-        db_values.append(value)
-
-    # 2. Asegurarnos de incluir id_tag (A/B/C)
-    # sobrescribimos por si acaso
-    if "id_tag" not in db_fields:
-        db_fields.insert(0, "id_tag")
-        db_values.insert(0, whale_id)
-
-    placeholders = ",".join(["?"] * len(db_fields))
-    fields_sql = ",".join(db_fields)
-
-    with database.get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            f"INSERT INTO records ({fields_sql}) VALUES ({placeholders})",
-            db_values
+    # 1. Si todo está bien (o si es 'C', no se validó), guardar en la BD
+    #    (database convierte claves GUI -> columnas SQL y separa lat/lon).
+    #    El INSERT corre en el hilo de BD; la GUI se actualiza al terminar.
+    def on_saved(_db_id):
+        # Mensaje opcional de éxito
+        messagebox.showinfo("Registro guardado", f"Registro de ballena {whale_id} guardado correctamente.")
+        # Notificar a la GUI que el registro se guardó bien
+        if "status_available" in handlers:
+            handlers["status_available"](whale_id)
+        # y que ya puede apagar el timer de esa ballena
+        if "reset_whale" in handlers:
+            handlers["reset_whale"](whale_id)
+
+        # Limpiar formulario
+        if "clear_forms" in handlers:
+            if whale_id == "A":
+                handlers["clear_forms"]["A"]()
+            elif whale_id == "B":
+                handlers["clear_forms"]["B"]()
+            else:
+                handlers["clear_forms"]["C"]()
+
+        # REFRESCAR TABLA DE ÚLTIMOS REGISTROS
+        if "refresh_last_records" in handlers:
+            handlers["refresh_last_records"]()
+
+        # contar el guardado para el backup automático
+        if "backup_notify_save" in handlers:
+            handlers["backup_notify_save"]()
+
+    def on_save_error(e):
+        messagebox.showerror(
+            "Error al guardar",
+            f"No se pudo guardar el registro de la ballena {whale_id}:\n{e}"
         )
-        conn.commit()
-
-    # Mensaje opcional de éxito
-    messagebox.showinfo("Registro guardado", f"Registro de ballena {whale_id} guardado correctamente.")
-    # Notificar a la GUI que el registro se guardó bien
-    if "status_available" in handlers:
-        handlers["status_available"](whale_id)
-
-    # Limpiar formulario
-    if "clear_forms" in handlers:
-        if whale_id == "A":
-            handlers["clear_forms"]["A"]()
-        elif whale_id == "B":
-            handlers["clear_forms"]["B"]()
-        else:
-            handlers["clear_forms"]["C"]()
+        if "save_failed" in handlers:
+            handlers["save_failed"](whale_id)
 
-    # REFRESCAR TABLA DE ÚLTIMOS REGISTROS
-    if "refresh_last_records" in handlers:
-        handlers["refresh_last_records"]()
+    handlers["run_db"](
+        database.insert_record, whale_id, cleaned_data,
+        on_done=on_saved, on_error=on_save_error
+    )
 
     return True
 
@@ -169,8 +176,9 @@ def update_record_field_handler(db_id, gui_field_name, new_value):
 def fetch_records_by_date_handler(start_date, end_date):
     return database.get_records_by_date(start_date, end_date)
 
-def get_current_position_handler(whale_id):
-    return gps.get_current_position(whale_id)
+def get_current_position_handler(whale_id, at=None):
+    """at: hora (time.time()) en que se presionó el botón, para elegir el fix más cercano."""
+    return gps.get_current_position(whale_id, at)
     # return "0.000000, 0.000000" 
 
 def configure_gps_handler(config_dict):
@@ -193,8 +201,31 @@ class App(tk.Tk):
         self.title("Whale System - Inicio")
         self.geometry("1200x650")
 
-        # init DB
-        database.init_db()
+        # init DB (las migraciones largas corren en un hilo aparte, con avance)
+        self._init_database()
+        database.start_checkpointer()
+
+        # stream de GPS en segundo plano (solo si está activado en gps_config.json)
+        gps.start_position_stream()
+
+        # hilo de BD: las consultas/escrituras no bloquean el loop de Tk
+        self.busy_label = tk.Label(
+            self,
+            text="⏳ Working with database...",
+            font=("Arial", 9),
+            bg="#FEF3C7",
+            fg="#92400E"
+        )
+        self.db_worker = DBWorker(self, on_busy_change=self._set_busy)
+        # hilo de GPS: las capturas de Start/Stop/Save no congelan la pantalla
+        self.gps_worker = TkWorker(self, name="gps-worker")
+
+        # backups automáticos (cada N guardados / M minutos y al cerrar), en su propio hilo
+        self._closing = False
+        self.backup_scheduler = None
+        config = database.load_storage_config()
+        if config.get("backup_enabled"):
+            self.backup_scheduler = backup.scheduler_from_config(config).start()
 
         # init handlers compartidos
         self.handlers = handlers
@@ -215,14 +246,173 @@ class App(tk.Tk):
         # crear pantallas y mostrar la de inicio
         self.show_screen("start")
 
+        # al cerrar la ventana, cerrar también las conexiones a la BD
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def _init_database(self):
+        """
+        Aplica las migraciones pendientes en un hilo de trabajo. Mientras
+        tanto la ventana muestra el avance y sigue respondiendo
+        (wait_variable corre el loop de Tk hasta que termina).
+        """
+        if not database.needs_migration():
+            database.init_db()
+            return
+
+        status = tk.Label(self, text="Updating database...", font=("Arial", 12))
+        status.pack(expand=True)
+        # no cerrar la ventana a mitad de una migración
+        self.protocol("WM_DELETE_WINDOW", lambda: None)
+
+        updates = queue.Queue()
+        finished = tk.BooleanVar(value=False)
+        result = {}
+
+        def work():
+            try:
+                database.init_db(progress=lambda version, done: updates.put((version, done)))
+            except Exception as e:
+                result["error"] = e
+            finally:
+                database.release_connection()
+                updates.put(None)
+
+        def poll():
+            last = None
+            while True:
+                try:
+                    item = updates.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    finished.set(True)
+                    return
+                last = item
+            if last is not None:
+                version, done = last
+                status.config(
+                    text=f"Updating database (step {version}/{database.SCHEMA_VERSION}): "
+                         f"{done} rows..."
+                )
+            self.after(100, poll)
+
+        threading.Thread(target=work, name="db-migrate", daemon=True).start()
+        poll()
+        self.wait_variable(finished)
+        status.destroy()
+
+        if "error" in result:
+            messagebox.showerror(
+                "Error en la base de datos",
+                f"No se pudo actualizar la base de datos:\n{result['error']}"
+            )
+            raise result["error"]
+
+    def _set_busy(self, busy):
+        """Muestra/oculta el indicador de BD ocupada (esquina inferior derecha)."""
+        if busy:
+            self.busy_label.place(relx=1.0, rely=1.0, x=-10, y=-10, anchor="se")
+            self.busy_label.lift()
+        else:
+            self.busy_label.place_forget()
+
+    def capture_position(self, whale_id, at, on_done=None, on_error=None):
+        """Pide la posición en el hilo de GPS; on_done(pos) vuelve al hilo de Tk."""
+        self.gps_worker.submit(
+            get_current_position_handler, whale_id, at,
+            on_done=on_done, on_error=on_error
+        )
+
+    def start_export(self, folder, **export_kwargs):
+        """Lanza una exportación en segundo plano y devuelve el ExportJob."""
+        job = exporter.ExportJob(folder, **export_kwargs)
+        job.start()
+        return job
+
+    def start_backup(self, folder):
+        """Lanza un backup completo en segundo plano y devuelve el BackupJob."""
+        job = backup.BackupJob(folder)
+        job.start()
+        return job
+
+    def on_close(self):
+        """
+        Cierre limpio: cierra la ruta general, cancela exportaciones, termina
+        el hilo de BD, hace el último backup automático, libera las
+        conexiones y el GPS, y destruye la ventana.
+        """
+        if self._closing:
+            return
+        self._closing = True
+        # desde aquí el hilo de BD se detiene: un "Save" ya no se guardaría
+        self._block_input()
+        if "tracking" in self.screens:
+            self.screens["tracking"].stop_general_tracking(show_message=False)
+        if "logs" in self.screens:
+            self.screens["logs"].cancel_export(wait=True)
+        self.gps_worker.stop(timeout=1)
+        self.db_worker.stop()
+
+        # el último backup (y uno manual en curso) corre en su hilo; la
+        # ventana avisa y sigue respondiendo
+        if self.backup_scheduler is not None and self.backup_scheduler.running:
+            self.backup_scheduler.stop(final_backup=True, timeout=0)
+        if self._backups_running():
+            self.busy_label.config(text="⏳ Saving backup before closing...")
+            self._wait_backup(time.monotonic() + backup.EXIT_BACKUP_TIMEOUT_SEC)
+        else:
+            self._finish_close()
+
+    def _block_input(self):
+        """Tapa las pantallas y toma el mouse/teclado mientras se cierra la App."""
+        cover = tk.Frame(self, cursor="watch")
+        cover.place(relx=0, rely=0, relwidth=1, relheight=1)
+        self.busy_label.config(text="⏳ Closing...")
+        self._set_busy(True)     # el aviso queda encima de la tapa
+        self.update_idletasks()
+        try:
+            cover.grab_set()
+        except tk.TclError:
+            pass  # sin grab, la tapa igual evita los clics en las pantallas
+
+    def _backups_running(self):
+        if self.backup_scheduler is not None and self.backup_scheduler.running:
+            return True
+        return getattr(self.screens.get("logs"), "backup_running", False)
+
+    def _wait_backup(self, deadline):
+        if self._backups_running() and time.monotonic() < deadline:
+            self.after(100, lambda: self._wait_backup(deadline))
+            return
+        if self._backups_running():
+            print("El backup no terminó a tiempo; se cierra igual.")
+        self._finish_close()
+
+    def _finish_close(self):
+        database.close_connections()
+        gps.stop_position_stream()
+        gps.close_provider()
+        gps.close_gnss_session()
+        self.destroy()
+
     def _init_handlers(self):
+        self.handlers["run_db"] = self.db_worker.submit
         self.handlers["save_whale"] = save_whale_handler
         self.handlers["fetch_last_records"] = fetch_last_records_handler
         self.handlers["update_record_field"] = update_record_field_handler
         self.handlers["get_current_position"] = get_current_position_handler
+        self.handlers["capture_position"] = self.capture_position
         self.handlers["fetch_records_by_date"] = fetch_records_by_date_handler
+        self.handlers["fetch_records_page"] = database.get_records_page
+        self.handlers["count_records"] = database.count_records
         self.handlers["delete_records"] = database.delete_records
-        self.handlers["backup_db"] = database.backup_database
+        self.handlers["save_route_points"] = database.insert_route_points
+        self.handlers["fill_derived_columns"] = database.fill_derived_columns
+        self.handlers["start_backup"] = self.start_backup
+        if self.backup_scheduler is not None:
+            self.handlers["backup_notify_save"] = self.backup_scheduler.notify_save
+        self.handlers["start_export"] = self.start_export
+        self.handlers["export_formats"] = exporter.available_formats
         self.handlers["configure_gps"] = configure_gps_handler
         # database.debug_print_all_records()
 
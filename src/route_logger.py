@@ -0,0 +1,158 @@
+import threading
+import time
+from datetime import datetime
+
+# Valores por defecto del registro de ruta: cada punto se entrega al sink
+# apenas llega (un commit en SQLite por punto; en WAL con synchronous=NORMAL
+# es barato), así un corte de luz no pierde puntos ya leídos.
+FLUSH_INTERVAL_SEC = 0.0    # entregar como máximo cada tantos segundos...
+FLUSH_BATCH_SIZE = 1        # ...o al juntar estas filas
+
+
+class RouteLogger:
+    """
+    Registro de la ruta general (General Route).
+
+    - Cada punto va a `sink(puntos)` (p. ej. database.insert_route_points),
+      con puntos (datetime, lat, lon). Por defecto se entrega uno por uno;
+      con `batch_size` / `flush_interval_sec` mayores se agrupan, a cambio de
+      perder ese lote si la app se cae.
+    - start() lanza un hilo que lee la posición cada `interval_sec` segundos
+      con `read_position()` -> (lat, lon) o None si no hay fix.
+    - Con `simplifier` (track_simplify.TrackSimplifier) solo se guardan los
+      puntos que deja la simplificación; si además hay `raw_sink`, los puntos
+      crudos se le entregan igual que a `sink`. Ojo: los puntos que la
+      simplificación todavía no decidió (a lo sumo route_max_interval_sec)
+      solo quedan en raw_sink si la app se cae.
+    """
+
+    def __init__(self, sink, flush_interval_sec=FLUSH_INTERVAL_SEC,
+                 batch_size=FLUSH_BATCH_SIZE, simplifier=None, raw_sink=None):
+        self.sink = sink
+        self.simplifier = simplifier
+        self.raw_sink = raw_sink
+        self.flush_interval_sec = flush_interval_sec
+        self.batch_size = batch_size
+
+        self.points_written = 0
+        self.points_skipped = 0    # lecturas sin fix
+        self.error = None          # excepción que detuvo el registro
+
+        self._opened = False
+        self._pending = []
+        self._pending_raw = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def open(self):
+        """Habilita el registro (los puntos se aceptan desde aquí)."""
+        self._opened = True
+        self._last_flush = time.monotonic()
+        return self
+
+    def log_point(self, lat, lon, when=None):
+        """Agrega un punto (when: datetime, por defecto ahora) y lo entrega si toca."""
+        when = when or datetime.now()
+        point = (when, lat, lon)
+        with self._lock:
+            if self.raw_sink is not None:
+                self._pending_raw.append(point)
+            if self.simplifier is not None:
+                self._pending.extend(self.simplifier.push(point))
+            else:
+                self._pending.append(point)
+            due = (max(len(self._pending), len(self._pending_raw)) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval_sec)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Entrega los puntos pendientes a raw_sink y sink."""
+        with self._lock:
+            if not self._opened:
+                return
+            points, self._pending = self._pending, []
+            raw, self._pending_raw = self._pending_raw, []
+            self._last_flush = time.monotonic()
+
+            if raw:
+                try:
+                    self.raw_sink(raw)
+                except Exception:
+                    self._pending_raw[:0] = raw
+                    self._pending[:0] = points
+                    raise
+            if not points:
+                return
+
+            try:
+                self.sink(points)
+            except Exception:
+                # se reintenta en el próximo punto
+                self._pending[:0] = points
+                raise
+            self.points_written += len(points)
+
+    def close(self):
+        """Detiene el hilo (si hay) y entrega lo pendiente."""
+        self.stop()
+        if self.simplifier is not None:
+            with self._lock:
+                self._pending.extend(self.simplifier.flush())
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._opened = False
+
+    # ---------- muestreo en segundo plano ---------- #
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, read_position, interval_sec):
+        """Registra read_position() cada interval_sec segundos en un hilo aparte."""
+        if not self._opened:
+            self.open()
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(read_position, interval_sec),
+            name="route-logger", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self, read_position, interval_sec):
+        # plazos fijos (monotónicos) para que la lectura no corra el intervalo
+        next_at = time.monotonic()
+        while not self._stop_event.is_set():
+            when = datetime.now()
+            try:
+                pos = read_position()
+            except Exception as e:
+                print("Error obteniendo posición GPS:", e)
+                pos = None
+
+            try:
+                if pos is None:
+                    self.points_skipped += 1
+                else:
+                    self.log_point(pos[0], pos[1], when)
+            except Exception as e:
+                self.error = e
+                return
+
+            next_at += interval_sec
+            wait = next_at - time.monotonic()
+            if wait < 0:
+                next_at = time.monotonic()   # lectura lenta: no acumular atraso
+                wait = 0
+            self._stop_event.wait(wait)
@@ -0,0 +1,105 @@
+import threading
+import queue
+
+
+class TkWorker:
+    """
+    Hilo único que ejecuta tareas lentas fuera del loop de Tk.
+
+    - submit() encola una función; el hilo la ejecuta en orden (FIFO), así un
+      "guardar" siempre termina antes que el "refrescar" que se pidió después.
+    - Los resultados vuelven al hilo de Tk con after(): on_done(resultado) o
+      on_error(excepción) se llaman siempre desde el hilo de la GUI.
+    - on_busy_change(ocupado) avisa cuando hay/no hay trabajos pendientes,
+      para mostrar un indicador.
+
+    No sabe nada de la base de datos: db_worker.DBWorker le agrega liberar
+    la conexión del hilo; para otras tareas (p. ej. lecturas de GPS) se usa
+    TkWorker directamente.
+    """
+
+    def __init__(self, tk_root, poll_ms=50, on_busy_change=None, name="tk-worker"):
+        self.tk_root = tk_root
+        self.poll_ms = poll_ms
+        self.on_busy_change = on_busy_change
+
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = 0          # solo se toca desde el hilo de Tk
+        self._poll_job = None
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._schedule_poll()
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def submit(self, fn, *args, on_done=None, on_error=None, **kwargs):
+        """Encola fn(*args, **kwargs). Llamar solo desde el hilo de Tk."""
+        self._pending += 1
+        if self._pending == 1 and self.on_busy_change:
+            self.on_busy_change(True)
+        self._jobs.put((fn, args, kwargs, on_done, on_error))
+
+    def stop(self, timeout=5):
+        """Termina los trabajos ya encolados y detiene el hilo."""
+        if self._poll_job is not None:
+            try:
+                self.tk_root.after_cancel(self._poll_job)
+            except Exception:
+                pass
+            self._poll_job = None
+
+        self._jobs.put(None)
+        self._thread.join(timeout=timeout)
+
+    # ---------- hilo de trabajo ----------
+
+    def _run(self):
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+
+                fn, args, kwargs, on_done, on_error = job
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    self._results.put((on_error, e, True))
+                else:
+                    self._results.put((on_done, result, False))
+        finally:
+            self._on_thread_exit()
+
+    def _on_thread_exit(self):
+        """Limpieza al terminar el hilo (corre en el hilo de trabajo)."""
+        pass
+
+    # ---------- hilo de Tk ----------
+
+    def _schedule_poll(self):
+        self._poll_job = self.tk_root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                callback, value, failed = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            self._pending -= 1
+            try:
+                if callback:
+                    callback(value)
+                elif failed:
+                    print(f"Error en tarea de {self._thread.name}:", value)
+            except Exception as e:
+                print(f"Error en callback de {self._thread.name}:", e)
+
+            if self._pending == 0 and self.on_busy_change:
+                self.on_busy_change(False)
+
+        self._schedule_poll()
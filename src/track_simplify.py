@@ -0,0 +1,118 @@
+import math
+
+METERS_PER_DEG_LAT = 111_320.0
+
+
+def _to_xy(lat, lon, lat0, lon0):
+    """Proyección local equirectangular en metros (suficiente para unos km)."""
+    x = (lon - lon0) * METERS_PER_DEG_LAT * math.cos(math.radians(lat0))
+    y = (lat - lat0) * METERS_PER_DEG_LAT
+    return x, y
+
+
+def _segment_distance(p, a, b):
+    """Distancia (m) del punto p al segmento a-b; puntos (lat, lon)."""
+    px, py = _to_xy(p[0], p[1], a[0], a[1])
+    bx, by = _to_xy(b[0], b[1], a[0], a[1])
+    length2 = bx * bx + by * by
+    if length2 == 0:
+        return math.hypot(px, py)
+    t = max(0.0, min(1.0, (px * bx + py * by) / length2))
+    return math.hypot(px - t * bx, py - t * by)
+
+
+def distance_m(a, b):
+    """Distancia aproximada (m) entre dos puntos (lat, lon) cercanos."""
+    x, y = _to_xy(b[0], b[1], a[0], a[1])
+    return math.hypot(x, y)
+
+
+class TrackSimplifier:
+    """
+    Simplificación en línea (streaming) de la ruta general, punto a punto.
+
+    1. Raleo por distancia/tiempo: se descarta un punto a menos de
+       `min_distance_m` del último aceptado, salvo que hayan pasado
+       `max_interval_sec` (así un bote quieto deja un punto cada tanto).
+    2. Ventana deslizante tipo Douglas–Peucker: se acumulan puntos desde el
+       último emitido (ancla); cuando alguno se aleja más de `tolerance_m` del
+       segmento ancla -> punto nuevo, se emite el punto anterior y pasa a ser
+       el ancla. La ventana se corta en `max_window` puntos.
+
+    push() devuelve la lista de puntos a guardar (puede ser vacía) y flush()
+    los que quedan al terminar. Los puntos son tuplas (when: datetime, lat, lon).
+    """
+
+    def __init__(self, tolerance_m=5.0, min_distance_m=2.0, max_interval_sec=60.0,
+                 max_window=500):
+        self.tolerance_m = tolerance_m
+        self.min_distance_m = min_distance_m
+        self.max_interval_sec = max_interval_sec
+        self.max_window = max_window
+
+        self.points_in = 0
+        self.points_out = 0
+
+        self._anchor = None      # último punto emitido
+        self._window = []        # puntos aceptados después del ancla
+        self._last = None        # último punto aceptado por el raleo
+        self._pushed = None      # último punto recibido (aunque el raleo lo descarte)
+
+    def _emit(self, point, out):
+        self._anchor = point
+        out.append(point)
+        self.points_out += 1
+
+    def _deviates(self, candidate):
+        a, b = self._anchor[1:3], candidate[1:3]
+        return any(
+            _segment_distance(p[1:3], a, b) > self.tolerance_m
+            for p in self._window
+        )
+
+    def push(self, point):
+        self.points_in += 1
+        self._pushed = point
+        out = []
+
+        if self._anchor is None:
+            self._emit(point, out)
+            self._last = point
+            return out
+
+        # 1. raleo por distancia/tiempo
+        elapsed = (point[0] - self._last[0]).total_seconds()
+        if (distance_m(self._last[1:3], point[1:3]) < self.min_distance_m
+                and elapsed < self.max_interval_sec):
+            return out
+        self._last = point
+
+        # ancla vieja: guardar igual para no dejar huecos largos
+        if (point[0] - self._anchor[0]).total_seconds() >= self.max_interval_sec:
+            if self._window:
+                self._emit(self._window[-1], out)
+            self._window = []
+            self._emit(point, out)
+            return out
+
+        # 2. ventana: si el segmento ancla->punto ya no representa la ventana,
+        #    el punto anterior se vuelve el nuevo ancla
+        if self._window and (self._deviates(point) or len(self._window) >= self.max_window):
+            self._emit(self._window[-1], out)
+            self._window = []
+        self._window.append(point)
+        return out
+
+    def flush(self):
+        """
+        Emite lo pendiente al detener el tracking: el último punto de la
+        ventana y, si el raleo lo había descartado, el último recibido, así
+        la ruta termina donde terminó el bote.
+        """
+        out = []
+        if self._window:
+            self._emit(self._window[-1], out)
+            self._window = []
+        if self._pushed is not None and self._pushed != self._anchor:
+            self._emit(self._pushed, out)
+        return out
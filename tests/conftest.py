@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """BD nueva con todas las migraciones, en una carpeta temporal."""
+    database.close_connections()
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "database.db")
+    database.init_db()
+    yield database.DB_PATH
+    database.close_connections()
@@ -0,0 +1,63 @@
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import backup
+import database
+
+
+def _observations(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT observations FROM records ORDER BY id"
+        )]
+    finally:
+        conn.close()
+
+
+def test_differential_backup_restores_later_changes(temp_db, tmp_path):
+    folder = tmp_path / "backups"
+    folder.mkdir()
+    for i in range(50):
+        database.insert_record("A", {"Date": f"2026-03-01 10:00:{i:02d}",
+                                     "Observations": f"obs {i}"})
+    base = backup.full_backup(folder)
+
+    database.insert_record("B", {"Date": "2026-03-02 09:00:00", "Observations": "nueva"})
+    database.update_record_field(1, "Observations", "cambiada")
+    diff = backup.differential_backup(folder)
+    assert diff.endswith(backup.DIFF_SUFFIX)
+
+    restored = backup.restore_backup(diff, tmp_path / "restored.db")
+    expected = ["cambiada"] + [f"obs {i}" for i in range(1, 50)] + ["nueva"]
+    assert _observations(restored) == expected
+    assert _observations(base)[0] == "obs 0"      # la base no cambia
+
+    # el índice y el manifiesto quedan aparte de los backups
+    files = {p.name for p in folder.iterdir() if p.is_file()}
+    assert files == {Path(base).name, Path(diff).name}
+
+
+def _touch_auto(folder, when):
+    name = f"database{backup.AUTO_BACKUP_TAG}{when:%Y-%m-%d_at_%H-%M-%S}{backup.AUTO_BACKUP_SUFFIX}"
+    (folder / name).write_bytes(b"")
+
+
+def test_apply_retention_keeps_last_hourly_and_daily(tmp_path):
+    now = datetime(2026, 3, 10, 12, 0, 0)
+    times = [now - timedelta(minutes=10 * i) for i in range(12)]      # 12:00 ... 10:10
+    times += [now - timedelta(days=d) for d in range(1, 6)]           # un backup por día
+    for when in times:
+        _touch_auto(tmp_path, when)
+
+    removed = backup.apply_retention(tmp_path, keep_last=2, keep_hourly=3, keep_daily=3)
+    kept = sorted(when for when, _ in backup.list_auto_backups(tmp_path))
+
+    assert kept == sorted({
+        *times[:2],                        # los 2 más nuevos (horas 12 y 11)
+        now - timedelta(minutes=70),       # el más nuevo de la hora 10
+        now - timedelta(days=1),           # días 9 y 8 (el 10 ya está)
+        now - timedelta(days=2),
+    })
+    assert len(removed) == len(times) - len(kept)
@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import gps
+
+
+class FakeLocator:
+    """Imita al Geolocator de winrt: devuelve posiciones que avanzan."""
+
+    def __init__(self):
+        self.reads = 0
+
+    async def get_geoposition_async(self):
+        self.reads += 1
+        await asyncio.sleep(0)
+        position = SimpleNamespace(latitude=27.5 + self.reads * 0.001, longitude=-112.0)
+        return SimpleNamespace(coordinate=SimpleNamespace(
+            point=SimpleNamespace(position=position), accuracy=4.0
+        ))
+
+
+@pytest.fixture
+def session():
+    created = []
+
+    def factory():
+        created.append(FakeLocator())
+        return created[-1]
+
+    s = gps.GNSSSession(factory)
+    s.created = created
+    yield s
+    s.close()
+
+
+def test_one_locator_and_loop_across_reads(session):
+    first = session.get_fix(timeout_sec=2.0)
+    loop = session._loop
+    second = session.get_fix(timeout_sec=2.0)
+
+    assert len(session.created) == 1
+    assert session.created[0].reads == 2
+    assert session._loop is loop
+    assert second.lat > first.lat
+    assert first.accuracy == 4.0
+
+
+def test_close_then_reopen(session):
+    session.get_fix(timeout_sec=2.0)
+    thread = session._thread
+    session.close()
+
+    assert session._loop is None
+    assert not thread.is_alive()
+
+    lat, lon = session.get_position(timeout_sec=2.0)
+    assert len(session.created) == 2          # locator nuevo tras cerrar
+    assert (lat, lon) == (pytest.approx(27.501), -112.0)
+    assert session._thread.is_alive()
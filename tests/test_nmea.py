@@ -0,0 +1,51 @@
+import pytest
+
+import gps
+
+
+def _sentence(body):
+    checksum = 0
+    for ch in body:
+        checksum ^= ord(ch)
+    return f"${body}*{checksum:02X}"
+
+
+def test_gga_fix():
+    fix = gps.parse_nmea_sentence(
+        _sentence("GPGGA,123519.00,2730.000,N,11200.600,W,1,08,0.9,10.0,M,,M,,")
+    )
+    assert fix.timestamp == pytest.approx(12 * 3600 + 35 * 60 + 19)
+    assert fix.lat == pytest.approx(27.5)
+    assert fix.lon == pytest.approx(-112.01)
+    assert fix.accuracy == pytest.approx(0.9 * gps.NMEA_UERE_M)
+
+
+def test_rmc_fix_any_talker():
+    fix = gps.parse_nmea_sentence(
+        _sentence("GNRMC,000001.00,A,2730.000,S,11200.000,E,0.0,0.0,181026,,")
+    )
+    assert (fix.lat, fix.lon) == (pytest.approx(-27.5), pytest.approx(112.0))
+    assert fix.accuracy is None
+
+
+@pytest.mark.parametrize("line", [
+    _sentence("GPGGA,123519.00,2730.000,N,11200.000,W,0,00,,,M,,M,,"),   # sin fix
+    _sentence("GPRMC,123519.00,V,2730.000,N,11200.000,W,0.0,0.0,181026,,"),  # no válido
+    _sentence("GPGSV,1,1,00"),                                           # otro tipo
+    "$GPGGA,123519.00,2730.000,N,11200.000,W,1,08,0.9,10.0,M,,M,,*00",   # checksum malo
+    "basura",
+    "",
+])
+def test_not_a_position(line):
+    assert gps.parse_nmea_sentence(line) is None
+
+
+def test_file_without_fix_raises_instead_of_spinning(tmp_path):
+    path = tmp_path / "empty.nmea"
+    path.write_text(_sentence("GPGSV,1,1,00") + "\n")
+    provider = gps.NMEAProvider(path=str(path), loop=True)
+    try:
+        with pytest.raises(gps.GPSNotAvailable):
+            provider.read_fix(timeout_sec=5.0)
+    finally:
+        provider.close()
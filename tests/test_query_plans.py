@@ -0,0 +1,17 @@
+import database
+
+
+def test_read_queries_use_indexes(temp_db):
+    assert database.check_query_plans() == []
+
+
+def test_query_plans_cover_every_read_function(temp_db):
+    conn = database.get_connection()
+    names = {case[0].split("(")[0] for case in database._query_plan_cases(conn)}
+    expected = {
+        "get_last_records", "iter_records", "get_records_page", "count_records",
+        "get_route_track", "fill_derived_columns",
+    }
+    if database._has_table(conn, "records_rtree"):   # SQLite con R*Tree
+        expected.add("get_records_in_bbox")
+    assert expected <= names
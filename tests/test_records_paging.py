@@ -0,0 +1,51 @@
+import database
+
+
+def _insert_day(day, count):
+    """count registros el mismo día, dos por segundo (mismo created_at)."""
+    ids = []
+    for i in range(count):
+        created_at = f"{day} 10:00:{i // 2:02d}"
+        ids.append(database.insert_record("A", {"Date": created_at}))
+    return ids
+
+
+def test_pages_forward_cover_the_range_in_order(temp_db):
+    ids = _insert_day("2026-03-01", 7)
+    _insert_day("2026-03-02", 3)     # fuera del rango
+
+    seen = []
+    page = database.get_records_page("2026-03-01", "2026-03-01", limit=3)
+    while page:
+        seen.extend(rec.db_id for rec in page)
+        last = page[-1]
+        page = database.get_records_page(
+            "2026-03-01", "2026-03-01",
+            after=(last.value("created_at"), last.db_id), limit=3
+        )
+
+    assert seen == ids
+
+
+def test_pages_backward_come_in_ascending_order(temp_db):
+    ids = _insert_day("2026-03-01", 7)
+    last = database.get_records_page("2026-03-01", "2026-03-01", limit=10)[-1]
+
+    page = database.get_records_page(
+        "2026-03-01", "2026-03-01",
+        before=(last.value("created_at"), last.db_id), limit=3
+    )
+    assert [rec.db_id for rec in page] == ids[3:6]
+
+    first = page[0]
+    page = database.get_records_page(
+        "2026-03-01", "2026-03-01",
+        before=(first.value("created_at"), first.db_id), limit=3
+    )
+    assert [rec.db_id for rec in page] == ids[0:3]
+
+
+def test_page_count_matches_count_records(temp_db):
+    _insert_day("2026-03-01", 5)
+    assert database.count_records("2026-03-01", "2026-03-01") == 5
+    assert database.get_records_page("2026-03-05", "2026-03-05") == []